@@ -0,0 +1,409 @@
+"""
+Assignment 4 – Task 2 batch matching
+=====================================
+
+Runs the Task 2 custom pipeline over a whole image directory instead of one
+``--image-a``/``--image-b`` pair.  Features are detected once per image on a
+process pool (optionally through the on-disk feature cache shared with
+``task2_sift.py``), then every pair, or the pairs listed in ``--pairs``, is
+matched from those in-memory descriptors and registered with RANSAC.
+
+Typical usage (from this directory):
+
+    python task2_batch.py --image-dir ./images --output-dir ./output/task2_batch
+    python task2_batch.py --image-dir ./images --pairs ./pairs.txt --feature-cache ./cache
+
+Each finished pair is appended to ``pairs.jsonl`` in the output directory, so
+an interrupted run picks up where it stopped when started again with the same
+settings.  At the end the results are consolidated into ``pairs.json`` and
+``pairs.csv``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from task2_sift import (
+    MOTION_MODELS,
+    FeatureCache,
+    KeypointArray,
+    SIFTFromScratch,
+    detect_features,
+    load_image,
+    match_descriptors,
+    match_descriptors_hamming,
+    match_descriptors_quantized,
+    ransac_transform,
+    to_grayscale_float,
+)
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Task 2 – detect once per image and match every pair of a directory"
+    )
+    parser.add_argument("--image-dir", type=Path, required=True, help="Directory of images")
+    parser.add_argument(
+        "--pairs",
+        type=Path,
+        default=None,
+        help="Text file with one 'name_a name_b' pair per line (default: all pairs)",
+    )
+    parser.add_argument(
+        "--resize-width",
+        type=int,
+        default=960,
+        help="Optional width to resize every image to (keeps aspect ratio)",
+    )
+    parser.add_argument("--octaves", type=int, default=4, help="Number of octaves in the pyramid")
+    parser.add_argument("--scales", type=int, default=3, help="Number of scales per octave")
+    parser.add_argument(
+        "--contrast-threshold",
+        type=float,
+        default=0.04,
+        help="Contrast threshold used to discard weak extrema",
+    )
+    parser.add_argument(
+        "--edge-threshold",
+        type=float,
+        default=10.0,
+        help="R parameter used to suppress edge responses",
+    )
+    parser.add_argument(
+        "--sigma", type=float, default=1.6, help="Base blur applied before building the pyramid"
+    )
+    parser.add_argument(
+        "--subpixel",
+        action="store_true",
+        help="Refine extrema to sub-pixel accuracy and drop unstable ones",
+    )
+    parser.add_argument(
+        "--max-keypoints",
+        type=int,
+        default=None,
+        help="Maximum keypoints per image (default: unlimited)",
+    )
+    parser.add_argument(
+        "--descriptor",
+        choices=["sift", "binary"],
+        default="sift",
+        help="Descriptor type; binary uses steered BRIEF with Hamming matching",
+    )
+    parser.add_argument(
+        "--quantize",
+        action="store_true",
+        help="Keep SIFT descriptors as uint8 (4x less memory) and match them with integers",
+    )
+    parser.add_argument(
+        "--ratio-test",
+        type=float,
+        default=0.75,
+        help="Lowe's ratio test threshold for descriptor matching",
+    )
+    parser.add_argument(
+        "--ransac-iters",
+        type=int,
+        default=2000,
+        help="Maximum RANSAC iterations per pair",
+    )
+    parser.add_argument(
+        "--ransac-confidence",
+        type=float,
+        default=0.995,
+        help="Stop RANSAC early once this confidence is reached",
+    )
+    parser.add_argument(
+        "--ransac-threshold",
+        type=float,
+        default=3.0,
+        help="Inlier threshold (pixels) used during RANSAC",
+    )
+    parser.add_argument(
+        "--ransac-seed", type=int, default=42, help="Seed for RANSAC sampling"
+    )
+    parser.add_argument(
+        "--motion-model",
+        choices=[*MOTION_MODELS, "auto"],
+        default="homography",
+        help="Transform fitted by RANSAC",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes for feature detection",
+    )
+    parser.add_argument(
+        "--feature-cache",
+        type=Path,
+        default=None,
+        help="Directory for cached keypoints/descriptors (disabled when omitted)",
+    )
+    parser.add_argument(
+        "--feature-cache-mb",
+        type=float,
+        default=2048,
+        help="Size limit of the feature cache; least recently used entries are evicted",
+    )
+    parser.add_argument(
+        "--save-correspondences",
+        action="store_true",
+        help="Also store the (index_a, index_b) keypoint pairs of every inlier in the JSON",
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        default=Path("output/task2_batch"),
+        help="Directory for pairs.jsonl (progress), pairs.json and pairs.csv",
+    )
+    return parser.parse_args(argv)
+
+
+def list_images(image_dir: Path) -> List[str]:
+    return sorted(
+        path.name
+        for path in image_dir.iterdir()
+        if path.is_file() and path.suffix.lower() in IMAGE_SUFFIXES
+    )
+
+
+def read_pairs(path: Path, names: Sequence[str]) -> List[Tuple[str, str]]:
+    """Pairs listed in ``path``; blank lines and ``#`` comments are skipped."""
+    known = set(names)
+    pairs = []
+    for number, line in enumerate(path.read_text(encoding="utf-8").splitlines(), start=1):
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        fields = line.split()
+        if len(fields) != 2 or not known.issuperset(fields):
+            raise ValueError(f"{path}:{number}: expected two image names, got {line!r}")
+        pairs.append((fields[0], fields[1]))
+    return pairs
+
+
+def detector_settings(args: argparse.Namespace) -> Dict[str, object]:
+    return {
+        "num_octaves": args.octaves,
+        "num_scales": args.scales,
+        "sigma": args.sigma,
+        "contrast_threshold": args.contrast_threshold,
+        "edge_threshold": args.edge_threshold,
+        "subpixel": args.subpixel,
+        "max_keypoints": args.max_keypoints,
+        "descriptor": args.descriptor,
+        "quantize": args.quantize,
+    }
+
+
+def detect_image(
+    path: Path,
+    resize_width: int | None,
+    settings: Dict[str, object],
+    cache_root: Path | None,
+    cache_bytes: int,
+) -> Tuple[str, KeypointArray, np.ndarray]:
+    """Worker: keypoints and descriptors of one image (through the cache if given)."""
+    gray = to_grayscale_float(load_image(path, resize_width))
+    sift = SIFTFromScratch(**settings)
+    cache = FeatureCache(cache_root, cache_bytes) if cache_root is not None else None
+    # Same key parameters as task2_sift.py, so both scripts share cache entries.
+    params = dict(sift.cache_params(), resize_width=resize_width)
+    keypoints, descriptors = detect_features(
+        gray, params, lambda: sift.detect_and_compute(gray), cache
+    )
+    # Copy out of the cache's memory maps before the arrays are pickled back.
+    return path.name, keypoints[:], np.array(descriptors)
+
+
+def load_progress(path: Path) -> Dict[Tuple[str, str], Dict[str, object]]:
+    """Finished pairs from ``pairs.jsonl``.
+
+    A line cut short by an interruption is dropped and the file rewritten
+    without it, so that new records are not appended onto the partial line.
+    """
+    done: Dict[Tuple[str, str], Dict[str, object]] = {}
+    if not path.exists():
+        return done
+    text = path.read_text(encoding="utf-8")
+    lines = text.splitlines()
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        done[record["image_a"], record["image_b"]] = record
+    if len(done) != len(lines) or (text and not text.endswith("\n")):
+        path.write_text("".join(json.dumps(record) + "\n" for record in done.values()), "utf-8")
+    return done
+
+
+def match_pair(
+    args: argparse.Namespace,
+    features: Dict[str, Tuple[KeypointArray, np.ndarray]],
+    name_a: str,
+    name_b: str,
+) -> Dict[str, object]:
+    kp_a, desc_a = features[name_a]
+    kp_b, desc_b = features[name_b]
+    if args.descriptor == "binary":
+        matches = match_descriptors_hamming(desc_a, desc_b, args.ratio_test)
+    elif args.quantize:
+        matches = match_descriptors_quantized(desc_a, desc_b, args.ratio_test)
+    else:
+        matches = match_descriptors(desc_a, desc_b, args.ratio_test)
+    stats: Dict[str, float] = {}
+    H, inliers = ransac_transform(
+        kp_a,
+        kp_b,
+        matches,
+        args.ransac_iters,
+        args.ransac_threshold,
+        model=args.motion_model,
+        seed=args.ransac_seed,
+        confidence=args.ransac_confidence,
+        stats=stats,
+    )
+    record: Dict[str, object] = {
+        "image_a": name_a,
+        "image_b": name_b,
+        "keypoints_a": len(kp_a),
+        "keypoints_b": len(kp_b),
+        "matches": len(matches),
+        "inliers": len(inliers),
+        "ransac_iterations": stats["iterations"],
+        "motion_model": stats["model"],
+        "homography": H.tolist() if H is not None else None,
+    }
+    if args.save_correspondences:
+        record["correspondences"] = np.column_stack(
+            (matches.idx_a[inliers], matches.idx_b[inliers])
+        ).tolist()
+    return record
+
+
+def write_tables(output_dir: Path, records: List[Dict[str, object]]) -> None:
+    (output_dir / "pairs.json").write_text(json.dumps(records, indent=2), encoding="utf-8")
+    columns = [
+        "image_a",
+        "image_b",
+        "keypoints_a",
+        "keypoints_b",
+        "matches",
+        "inliers",
+        "ransac_iterations",
+        "motion_model",
+    ]
+    with (output_dir / "pairs.csv").open("w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns + [f"h{row}{col}" for row in range(3) for col in range(3)])
+        for record in records:
+            H = record["homography"]
+            flat = np.asarray(H).ravel().tolist() if H is not None else [""] * 9
+            writer.writerow([record[column] for column in columns] + flat)
+
+
+def run_batch(args: argparse.Namespace) -> int:
+    names = list_images(args.image_dir)
+    if args.pairs is not None:
+        pairs = read_pairs(args.pairs, names)
+    else:
+        pairs = list(itertools.combinations(names, 2))
+    print(f"[Batch] {len(names)} images, {len(pairs)} pairs")
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    settings = dict(
+        detector_settings(args),
+        image_dir=str(args.image_dir.resolve()),
+        resize_width=args.resize_width,
+        ratio_test=args.ratio_test,
+        ransac_iters=args.ransac_iters,
+        ransac_confidence=args.ransac_confidence,
+        ransac_threshold=args.ransac_threshold,
+        ransac_seed=args.ransac_seed,
+        motion_model=args.motion_model,
+        save_correspondences=args.save_correspondences,
+    )
+    settings_path = args.output_dir / "batch_settings.json"
+    if settings_path.exists():
+        previous = json.loads(settings_path.read_text(encoding="utf-8"))
+        if previous != settings:
+            print(
+                f"[Batch] {args.output_dir} holds results for different settings; "
+                "use another --output-dir"
+            )
+            return 1
+    else:
+        settings_path.write_text(json.dumps(settings, indent=2), encoding="utf-8")
+
+    progress_path = args.output_dir / "pairs.jsonl"
+    done = load_progress(progress_path)
+    todo = [pair for pair in pairs if pair not in done]
+    if done:
+        print(f"[Batch] Resuming: {len(pairs) - len(todo)} pairs already done")
+
+    needed = sorted({name for pair in todo for name in pair})
+    features: Dict[str, Tuple[KeypointArray, np.ndarray]] = {}
+    start = time.perf_counter()
+    cache_bytes = int(args.feature_cache_mb * (1 << 20))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.processes) as pool:
+        futures = [
+            pool.submit(
+                detect_image,
+                args.image_dir / name,
+                args.resize_width,
+                detector_settings(args),
+                args.feature_cache,
+                cache_bytes,
+            )
+            for name in needed
+        ]
+        for count, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+            name, keypoints, descriptors = future.result()
+            features[name] = (keypoints, descriptors)
+            print(f"[Batch] Detected {count}/{len(needed)}: {name} ({len(keypoints)} keypoints)")
+    if needed:
+        megabytes = sum(desc.nbytes + kps.nbytes for kps, desc in features.values()) / (1 << 20)
+        print(
+            f"[Batch] Detection: {time.perf_counter() - start:.2f}s, "
+            f"{megabytes:.1f} MiB of features in memory"
+        )
+
+    start = time.perf_counter()
+    with progress_path.open("a", encoding="utf-8") as progress:
+        for count, (name_a, name_b) in enumerate(todo, start=1):
+            record = match_pair(args, features, name_a, name_b)
+            progress.write(json.dumps(record) + "\n")
+            progress.flush()
+            done[name_a, name_b] = record
+            if count % 100 == 0 or count == len(todo):
+                print(
+                    f"[Batch] Matched {count}/{len(todo)} pairs "
+                    f"({time.perf_counter() - start:.2f}s)"
+                )
+
+    write_tables(args.output_dir, [done[pair] for pair in pairs])
+    print(f"[Batch] Tables written to {args.output_dir.resolve()}")
+    return 0
+
+
+def main(argv: Sequence[str]) -> int:
+    args = parse_args(argv)
+    return run_batch(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
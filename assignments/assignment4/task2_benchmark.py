@@ -0,0 +1,256 @@
+"""
+Assignment 4 – Task 2 benchmark
+================================
+
+Times the custom SIFT pipeline from ``task2_sift.py`` against OpenCV's
+``cv2.SIFT`` on synthetic textures from 480p up to 24 MP, so nothing needs to
+be downloaded.  For every resolution and detector it records the per-stage
+wall/CPU time, throughput in megapixels per second and peak memory, and writes
+a JSON report.  When a baseline report is given, any case or stage that got
+slower than the tolerance allows is listed and the script exits with status 1.
+
+Typical usage (from this directory):
+
+    python task2_benchmark.py --update-baseline --baseline ./output/bench_baseline.json
+    python task2_benchmark.py --baseline ./output/bench_baseline.json
+
+Each case runs in a fresh worker process so that ``peak_rss_mb`` (the
+process high-water mark) belongs to that case alone.  The fastest of
+``--repeats`` runs is compared, and stages under ``--min-stage-time`` are
+skipped; single runs of short stages vary by 30% or more between otherwise
+identical runs, so lowering either makes the gate report noise.
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import json
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import cv2
+import numpy as np
+
+from task2_sift import SIFTFromScratch, StageRecorder
+
+RESOLUTIONS: Dict[str, tuple] = {
+    "480p": (640, 480),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+    "12mp": (4000, 3000),
+    "24mp": (6000, 4000),
+}
+
+DETECTORS = ("custom", "opencv")
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Task 2 – benchmark the custom SIFT pipeline against cv2.SIFT"
+    )
+    parser.add_argument(
+        "--resolutions",
+        nargs="+",
+        choices=list(RESOLUTIONS),
+        default=list(RESOLUTIONS),
+        help="Synthetic image sizes to benchmark",
+    )
+    parser.add_argument(
+        "--detectors",
+        nargs="+",
+        choices=DETECTORS,
+        default=list(DETECTORS),
+        help="Pipelines to benchmark",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=3,
+        help="Runs per case; the fastest run is reported (fewer makes the regression gate flaky)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker threads for the custom pipeline",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=Path("./output/task2_benchmark.json"),
+        help="Where to write the JSON report",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=None,
+        help="Baseline report to compare against (regressions exit with status 1)",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Write the report to --baseline instead of comparing against it",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed relative slowdown before a case or stage counts as a regression",
+    )
+    parser.add_argument(
+        "--min-stage-time",
+        type=float,
+        default=0.1,
+        help="Stages faster than this (seconds) in the baseline are too noisy to compare",
+    )
+    args = parser.parse_args(argv)
+    if args.update_baseline and args.baseline is None:
+        parser.error("--update-baseline needs --baseline")
+    return args
+
+
+def synthetic_texture(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """Deterministic multi-scale blob texture as a float32 image in [0, 1]."""
+    rng = np.random.default_rng(seed)
+    image = np.zeros((height, width), dtype=np.float32)
+    for sigma, weight in ((1.5, 0.2), (4.0, 0.5), (12.0, 0.3)):
+        noise = rng.standard_normal((height, width), dtype=np.float32)
+        # Blurring white noise scales its std by roughly 1 / (2 sqrt(pi) sigma).
+        image += (weight * sigma) * cv2.GaussianBlur(noise, (0, 0), sigma)
+    image -= image.min()
+    image /= max(float(image.max()), 1e-6)
+    return image
+
+
+def run_case(name: str, detector: str, repeats: int, workers: int) -> Dict[str, object]:
+    width, height = RESOLUTIONS[name]
+    image = synthetic_texture(width, height)
+    megapixels = width * height / 1e6
+
+    best: Dict[str, object] | None = None
+    for _ in range(repeats):
+        recorder = StageRecorder()
+        tracemalloc.start()
+        start = time.perf_counter()
+        if detector == "custom":
+            sift = SIFTFromScratch(workers=workers, observer=recorder)
+            keypoints, _ = sift.detect_and_compute(image)
+            num_keypoints = len(keypoints)
+        else:
+            sift = cv2.SIFT_create()
+            image_u8 = (image * 255).astype(np.uint8)
+            with recorder.stage("detect"):
+                cv_keypoints = sift.detect(image_u8, None)
+            with recorder.stage("compute"):
+                cv_keypoints, _ = sift.compute(image_u8, cv_keypoints)
+            num_keypoints = len(cv_keypoints)
+        wall = time.perf_counter() - start
+        tracemalloc.stop()
+        if best is None or wall < best["wall_s"]:
+            best = {
+                "resolution": name,
+                "detector": detector,
+                "width": width,
+                "height": height,
+                "megapixels": megapixels,
+                "keypoints": num_keypoints,
+                "wall_s": wall,
+                "mp_per_s": megapixels / wall,
+                "stages": recorder.stages,
+            }
+    # ru_maxrss is in KiB on Linux.
+    best["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return best
+
+
+def compare(
+    report: Dict[str, object],
+    baseline: Dict[str, object],
+    tolerance: float,
+    min_stage_time: float,
+) -> List[str]:
+    """Human-readable descriptions of every case/stage slower than the baseline allows."""
+    reference = {(case["resolution"], case["detector"]): case for case in baseline["cases"]}
+    regressions: List[str] = []
+    for case in report["cases"]:
+        base = reference.get((case["resolution"], case["detector"]))
+        if base is None:
+            continue
+        label = f"{case['detector']}@{case['resolution']}"
+        timings = [("total", case["wall_s"], base["wall_s"])]
+        timings += [
+            (stage, entry["wall_s"], base["stages"][stage]["wall_s"])
+            for stage, entry in case["stages"].items()
+            if stage in base["stages"] and base["stages"][stage]["wall_s"] >= min_stage_time
+        ]
+        for stage, current, previous in timings:
+            if current > previous * (1 + tolerance):
+                regressions.append(
+                    f"{label} {stage}: {current:.3f}s vs baseline {previous:.3f}s "
+                    f"({100 * (current / previous - 1):+.0f}%)"
+                )
+    return regressions
+
+
+def run_benchmark(args: argparse.Namespace) -> int:
+    cases = []
+    for name in args.resolutions:
+        for detector in args.detectors:
+            # A fresh process per case keeps peak_rss_mb specific to that case.
+            with concurrent.futures.ProcessPoolExecutor(max_workers=1) as pool:
+                case = pool.submit(run_case, name, detector, args.repeats, args.workers).result()
+            cases.append(case)
+            print(
+                f"[Bench] {detector:<6} {name:<6} {case['megapixels']:6.2f} MP  "
+                f"{case['wall_s']:8.3f}s  {case['mp_per_s']:6.2f} MP/s  "
+                f"{case['keypoints']:7d} kps  peak {case['peak_rss_mb']:.0f} MiB"
+            )
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "machine": platform.machine(),
+            "workers": args.workers,
+            "repeats": args.repeats,
+        },
+        "cases": cases,
+    }
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"[Bench] Report written to {args.output.resolve()}")
+
+    if args.baseline is None:
+        return 0
+    if args.update_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"[Bench] Baseline updated: {args.baseline.resolve()}")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    regressions = compare(report, baseline, args.tolerance, args.min_stage_time)
+    if regressions:
+        print(f"[Bench] {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+        for line in regressions:
+            print(f"[Bench]   {line}")
+        return 1
+    print(f"[Bench] No regressions against {args.baseline}")
+    return 0
+
+
+def main(argv: Sequence[str]) -> int:
+    args = parse_args(argv)
+    return run_benchmark(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
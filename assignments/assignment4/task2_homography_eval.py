@@ -0,0 +1,306 @@
+"""
+Assignment 4 – Task 2 ground-truth evaluation
+==============================================
+
+Warps an input image (or a synthetic texture) with random homographies whose
+values are known, degrades the warped copy with noise, blur and an
+illumination change, and runs the Task 2 pipelines on every pair: the custom
+SIFT with the exact matcher and RANSAC, and the OpenCV SIFT baseline.  For
+each parameter set it records the mean wall time per pair and the corner
+reprojection error of the estimated homography, then prints a speed/accuracy
+table with the Pareto-optimal rows marked.
+
+Typical usage (from this directory):
+
+    python task2_homography_eval.py --image ./images/00.JPG \\
+        --octaves 3 4 --scales 2 3 --ratio-tests 0.7 0.8 --ransac-iters 200 2000
+
+RANSAC runs with ``--ransac-confidences`` (default 1.0, i.e. no early stop)
+so that the ``--ransac-iters`` caps actually change the work done.  The table
+is also written as CSV and JSON to ``--output-dir``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import functools
+import itertools
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from task2_benchmark import synthetic_texture
+from task2_sift import (
+    KeypointArray,
+    SIFTFromScratch,
+    detect_opencv,
+    load_image,
+    match_descriptors,
+    match_descriptors_opencv,
+    ransac_homography,
+    to_grayscale_float,
+)
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Task 2 – speed/accuracy of homography estimation against ground truth"
+    )
+    parser.add_argument(
+        "--image",
+        type=Path,
+        default=None,
+        help="Source image (a synthetic texture is used when omitted)",
+    )
+    parser.add_argument(
+        "--resize-width",
+        type=int,
+        default=640,
+        help="Width the source image is resized to (keeps aspect ratio)",
+    )
+    parser.add_argument("--num-warps", type=int, default=5, help="Random homographies per run")
+    parser.add_argument(
+        "--max-corner-shift",
+        type=float,
+        default=0.15,
+        help="Largest corner displacement of the random warps, as a fraction of the image size",
+    )
+    parser.add_argument(
+        "--noise", type=float, default=0.01, help="Std of additive Gaussian noise (image in [0, 1])"
+    )
+    parser.add_argument(
+        "--blur", type=float, default=1.0, help="Largest Gaussian blur sigma applied to the warp"
+    )
+    parser.add_argument(
+        "--illumination",
+        type=float,
+        default=0.2,
+        help="Largest relative gain/bias change applied to the warp",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed for warps and degradations")
+    parser.add_argument("--octaves", type=int, nargs="+", default=[4], help="Octave counts to try")
+    parser.add_argument("--scales", type=int, nargs="+", default=[3], help="Scale counts to try")
+    parser.add_argument(
+        "--ratio-tests", type=float, nargs="+", default=[0.75], help="Ratio-test thresholds to try"
+    )
+    parser.add_argument(
+        "--ransac-iters", type=int, nargs="+", default=[2000], help="RANSAC iteration caps to try"
+    )
+    parser.add_argument(
+        "--ransac-confidences",
+        type=float,
+        nargs="+",
+        default=[1.0],
+        help="RANSAC early-stop confidences to try (1.0 always runs the full iteration cap)",
+    )
+    parser.add_argument(
+        "--ransac-threshold",
+        type=float,
+        default=3.0,
+        help="Inlier threshold (pixels) used during RANSAC",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=2.0,
+        help="Registration tolerance (mean corner error, pixels) counted as a success",
+    )
+    parser.add_argument(
+        "--min-success",
+        type=float,
+        default=0.9,
+        help="Fraction of warps that must meet the tolerance for a setting to be recommended",
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        default=Path("./output/task2_eval"),
+        help="Directory for the CSV/JSON tables",
+    )
+    return parser.parse_args(argv)
+
+
+def random_homography(
+    rng: np.random.Generator, width: int, height: int, max_shift: float
+) -> np.ndarray:
+    corners = np.float32([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]])
+    shift = max_shift * min(width, height)
+    moved = corners + rng.uniform(-shift, shift, size=corners.shape).astype(np.float32)
+    return cv2.getPerspectiveTransform(corners, moved)
+
+
+def degrade(
+    rng: np.random.Generator, image: np.ndarray, noise: float, blur: float, illumination: float
+) -> np.ndarray:
+    """Random blur, gain/bias change and additive noise on a float image in [0, 1]."""
+    sigma = rng.uniform(0, blur)
+    if sigma > 0.1:
+        image = cv2.GaussianBlur(image, (0, 0), sigma)
+    gain = rng.uniform(1 - illumination, 1 + illumination)
+    bias = rng.uniform(-illumination, illumination) / 2
+    image = image * gain + bias
+    if noise > 0:
+        image = image + rng.normal(0, noise, image.shape).astype(np.float32)
+    return np.clip(image, 0, 1).astype(np.float32)
+
+
+def corner_error(
+    estimate: np.ndarray | None, truth: np.ndarray, width: int, height: int
+) -> float:
+    """Mean distance between the image corners mapped by ``estimate`` and ``truth``."""
+    if estimate is None:
+        return float("inf")
+    corners = np.float64([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]])
+    projected = []
+    for H in (estimate, truth):
+        mapped = np.column_stack((corners, np.ones(4))) @ H.T
+        projected.append(mapped[:, :2] / mapped[:, 2:3])
+    return float(np.linalg.norm(projected[0] - projected[1], axis=1).mean())
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def pareto_front(rows: List[Dict[str, object]]) -> None:
+    """Mark rows not beaten on both mean time and median error by another row."""
+    for row in rows:
+        row["pareto"] = not any(
+            other["time_s"] <= row["time_s"]
+            and other["median_error_px"] <= row["median_error_px"]
+            and (
+                other["time_s"] < row["time_s"]
+                or other["median_error_px"] < row["median_error_px"]
+            )
+            for other in rows
+        )
+
+
+def run_eval(args: argparse.Namespace) -> int:
+    if args.image is not None:
+        gray_a = to_grayscale_float(load_image(args.image, args.resize_width))
+    else:
+        width = args.resize_width
+        gray_a = synthetic_texture(width, width * 3 // 4, seed=args.seed)
+    height, width = gray_a.shape
+
+    rng = np.random.default_rng(args.seed)
+    warps: List[Tuple[np.ndarray, np.ndarray]] = []
+    for _ in range(args.num_warps):
+        H_true = random_homography(rng, width, height, args.max_corner_shift)
+        warped = cv2.warpPerspective(gray_a, H_true, (width, height))
+        warps.append((H_true, degrade(rng, warped, args.noise, args.blur, args.illumination)))
+
+    # Detection only depends on the detector settings, so it is done once per
+    # image and its time is added to every matching/RANSAC setting that uses it.
+    features: Dict[tuple, Tuple[KeypointArray, np.ndarray, float]] = {}
+
+    def detect(key: tuple, image: np.ndarray, compute) -> Tuple[KeypointArray, np.ndarray, float]:
+        if key not in features:
+            (keypoints, descriptors), elapsed = timed(compute, image)
+            features[key] = (keypoints, descriptors, elapsed)
+        return features[key]
+
+    pipelines: List[Tuple[str, int | None, int | None]] = [("opencv", None, None)]
+    pipelines += [("custom", o, s) for o, s in itertools.product(args.octaves, args.scales)]
+    reference = cv2.SIFT_create()
+
+    rows: List[Dict[str, object]] = []
+    for (pipeline, octaves, scales), ratio, iterations, confidence in itertools.product(
+        pipelines, args.ratio_tests, args.ransac_iters, args.ransac_confidences
+    ):
+        if pipeline == "custom":
+            sift = SIFTFromScratch(num_octaves=octaves, num_scales=scales)
+            compute = sift.detect_and_compute
+            match = match_descriptors
+        else:
+            compute = functools.partial(detect_opencv, reference)
+            match = match_descriptors_opencv
+
+        errors: List[float] = []
+        times: List[float] = []
+        kp_a, desc_a, time_a = detect((pipeline, octaves, scales, -1), gray_a, compute)
+        for warp_idx, (H_true, gray_b) in enumerate(warps):
+            kp_b, desc_b, time_b = detect((pipeline, octaves, scales, warp_idx), gray_b, compute)
+            matches, match_time = timed(match, desc_a, desc_b, ratio)
+            (H, _), ransac_time = timed(
+                ransac_homography,
+                kp_a,
+                kp_b,
+                matches,
+                iterations,
+                args.ransac_threshold,
+                confidence=confidence,
+            )
+            errors.append(corner_error(H, H_true, width, height))
+            times.append(time_a + time_b + match_time + ransac_time)
+
+        errors_arr = np.array(errors)
+        rows.append(
+            {
+                "pipeline": pipeline,
+                "octaves": octaves,
+                "scales": scales,
+                "ratio_test": ratio,
+                "ransac_iters": iterations,
+                "ransac_confidence": confidence,
+                "time_s": float(np.mean(times)),
+                "median_error_px": float(np.median(errors_arr)),
+                "success_rate": float(np.mean(errors_arr <= args.tolerance)),
+            }
+        )
+
+    pareto_front(rows)
+    rows.sort(key=lambda row: (row["time_s"], row["median_error_px"]))
+
+    print(
+        f"[Eval] {width}x{height}, {args.num_warps} warps, tolerance {args.tolerance:.1f}px"
+    )
+    print(
+        "[Eval] pipeline octaves scales ratio  iters   conf   time_s  median_err  success  pareto"
+    )
+    for row in rows:
+        print(
+            f"[Eval] {row['pipeline']:<8} {str(row['octaves'] or '-'):>7} "
+            f"{str(row['scales'] or '-'):>6} {row['ratio_test']:5.2f} {row['ransac_iters']:6d} "
+            f"{row['ransac_confidence']:6.3f} {row['time_s']:8.3f} "
+            f"{row['median_error_px']:11.3f} {row['success_rate']:8.0%}  "
+            f"{'*' if row['pareto'] else ''}"
+        )
+    meeting = [row for row in rows if row["success_rate"] >= args.min_success]
+    if meeting:
+        best = meeting[0]
+        print(
+            f"[Eval] Fastest within tolerance: {best['pipeline']} octaves={best['octaves']} "
+            f"scales={best['scales']} ratio={best['ratio_test']} iters={best['ransac_iters']} "
+            f"confidence={best['ransac_confidence']} "
+            f"({best['time_s']:.3f}s/pair)"
+        )
+    else:
+        print("[Eval] No setting met the tolerance")
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    with (args.output_dir / "pareto.csv").open("w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    (args.output_dir / "pareto.json").write_text(json.dumps(rows, indent=2), encoding="utf-8")
+    print(f"[Eval] Tables written to {args.output_dir.resolve()}")
+    return 0
+
+
+def main(argv: Sequence[str]) -> int:
+    args = parse_args(argv)
+    return run_eval(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
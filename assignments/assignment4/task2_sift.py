@@ -17,38 +17,248 @@ primitive operations (Gaussian blur, colour conversion, drawing).
 from __future__ import annotations
 
 import argparse
+import concurrent.futures
+import contextlib
 import dataclasses
+import functools
+import hashlib
+import itertools
+import json
 import math
+import os
 import random
+import shutil
 import sys
+import threading
+import time
+import tracemalloc
 from pathlib import Path
-from typing import Iterable, List, Sequence, Tuple
+from typing import Callable, ContextManager, Dict, Iterator, List, NamedTuple, Sequence, Tuple
 
 import cv2
 import numpy as np
 
+# Upper bound on the number of pixel samples gathered at once when batching
+# per-keypoint windows; keeps the temporary index/value arrays to tens of MB.
+_MAX_GATHER_ELEMENTS = 1 << 22
+
+# Tile crops start on multiples of this many pixels so OpenCV's vectorised
+# filters split each row the same way as for the whole image; otherwise the
+# last few columns can differ by one ulp.
+_TILE_ALIGN = 64
+
+# Default size of one float32 distance tile in match_descriptors.
+_MATCH_TILE_BYTES = 64 << 20
+
+# Binary descriptors: 256 intensity comparisons packed into 32 bytes.  The
+# point pairs follow BRIEF's isotropic Gaussian layout (sigma = patch / 5) in
+# units of the SIFT window's half width, clipped to +-0.7 per axis so that a
+# rotated pattern stays inside the SIFT window (and hence the tile halo).
+_BINARY_BITS = 256
+_BINARY_PATTERN = np.clip(
+    np.random.default_rng(0x5EED).normal(0.0, 0.4, size=(_BINARY_BITS, 2, 2)), -0.7, 0.7
+)
+
+# Version of the custom detector's output, part of its feature cache key.
+# Bump it whenever keypoints or descriptors change for the same settings so
+# cached features from older code are not served.
+_FEATURE_VERSION = 1
+
+# Number of set bits in every byte value, for Hamming distances.
+_POPCOUNT_8 = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
 
 # ---------------------------------------------------------------------------
 # Data structures
 
 
 @dataclasses.dataclass
-class Keypoint:
-    """Minimal representation of a SIFT keypoint used in this assignment."""
+class KeypointArray:
+    """Struct-of-arrays keypoint container: one NumPy column per attribute.
+
+    ``x``/``y`` are in full-resolution image coordinates, ``orientation`` is
+    in degrees (like ``cv2.KeyPoint.angle``, so whole-degree bins stay exact
+    in float32) and ``response`` is the DoG value at the detected extremum.
+    Each keypoint costs 28 bytes (five float32 and two int32 columns).
+    """
+
+    x: np.ndarray
+    y: np.ndarray
+    octave: np.ndarray
+    layer: np.ndarray
+    sigma: np.ndarray
+    orientation: np.ndarray
+    response: np.ndarray
+
+    _FLOAT_FIELDS = ("x", "y", "sigma", "orientation", "response")
+    _INT_FIELDS = ("octave", "layer")
+
+    def __post_init__(self) -> None:
+        for name in self._FLOAT_FIELDS:
+            setattr(self, name, np.asarray(getattr(self, name), dtype=np.float32).ravel())
+        for name in self._INT_FIELDS:
+            setattr(self, name, np.asarray(getattr(self, name), dtype=np.int32).ravel())
+
+    @classmethod
+    def empty(cls) -> "KeypointArray":
+        return cls(*([np.empty(0)] * len(dataclasses.fields(cls))))
+
+    @classmethod
+    def concatenate(cls, parts: Sequence["KeypointArray"]) -> "KeypointArray":
+        if not parts:
+            return cls.empty()
+        return cls(
+            **{
+                field.name: np.concatenate([getattr(part, field.name) for part in parts])
+                for field in dataclasses.fields(cls)
+            }
+        )
 
-    x: float
-    y: float
-    octave: int
-    layer: int
-    sigma: float
-    orientation: float
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def __getitem__(self, index: slice | np.ndarray) -> "KeypointArray":
+        return KeypointArray(
+            **{field.name: getattr(self, field.name)[index] for field in dataclasses.fields(self)}
+        )
+
+    def replace(self, **columns: np.ndarray) -> "KeypointArray":
+        return dataclasses.replace(self, **columns)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, field.name).nbytes for field in dataclasses.fields(self))
+
+    def points(self) -> np.ndarray:
+        """(N, 2) float32 array of ``(x, y)`` image coordinates."""
+        return np.column_stack((self.x, self.y))
+
+    @classmethod
+    def from_cv_keypoints(cls, keypoints: Sequence[cv2.KeyPoint]) -> "KeypointArray":
+        """Inverse of :meth:`to_cv_keypoints`; ``layer`` is not known and set to 0."""
+        return cls(
+            x=[kp.pt[0] for kp in keypoints],
+            y=[kp.pt[1] for kp in keypoints],
+            octave=[kp.octave for kp in keypoints],
+            layer=np.zeros(len(keypoints)),
+            sigma=[kp.size / 2 for kp in keypoints],
+            orientation=[kp.angle for kp in keypoints],
+            response=[kp.response for kp in keypoints],
+        )
+
+    def to_cv_keypoints(self) -> List[cv2.KeyPoint]:
+        return [
+            cv2.KeyPoint(
+                x,
+                y,
+                2 * sigma,
+                angle,
+                response,
+                octave,
+            )
+            for x, y, sigma, angle, response, octave in zip(
+                self.x.tolist(),
+                self.y.tolist(),
+                self.sigma.tolist(),
+                self.orientation.tolist(),
+                self.response.tolist(),
+                self.octave.tolist(),
+            )
+        ]
 
 
 @dataclasses.dataclass
-class Match:
-    idx_a: int
-    idx_b: int
-    distance: float
+class MatchArray:
+    """Putative correspondences as parallel index/distance columns."""
+
+    idx_a: np.ndarray
+    idx_b: np.ndarray
+    distance: np.ndarray
+
+    def __post_init__(self) -> None:
+        self.idx_a = np.asarray(self.idx_a, dtype=np.int64).ravel()
+        self.idx_b = np.asarray(self.idx_b, dtype=np.int64).ravel()
+        self.distance = np.asarray(self.distance, dtype=np.float32).ravel()
+
+    @classmethod
+    def empty(cls) -> "MatchArray":
+        return cls(np.empty(0), np.empty(0), np.empty(0))
+
+    @classmethod
+    def from_cv_matches(cls, matches: Sequence[cv2.DMatch]) -> "MatchArray":
+        return cls(
+            [m.queryIdx for m in matches],
+            [m.trainIdx for m in matches],
+            [m.distance for m in matches],
+        )
+
+    def __len__(self) -> int:
+        return len(self.idx_a)
+
+    def __getitem__(self, index: slice | np.ndarray | Sequence[int]) -> "MatchArray":
+        return MatchArray(self.idx_a[index], self.idx_b[index], self.distance[index])
+
+    def to_cv_matches(self) -> List[cv2.DMatch]:
+        return [
+            cv2.DMatch(_queryIdx=ia, _trainIdx=ib, _distance=dist)
+            for ia, ib, dist in zip(
+                self.idx_a.tolist(), self.idx_b.tolist(), self.distance.tolist()
+            )
+        ]
+
+
+class StageRecorder:
+    """Per-stage timings and per-octave counters reported by SIFTFromScratch.
+
+    Pass an instance as ``SIFTFromScratch(observer=...)``.  Stage entries are
+    accumulated over every call (one per level, octave or image): ``wall_s``,
+    ``cpu_s`` (CPU time of the calling thread) and ``peak_bytes``, the largest
+    increase in traced memory during one call.  Peaks are only recorded while
+    :mod:`tracemalloc` is tracing and are only meaningful with ``workers=1``.
+    """
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, Dict[str, float | int | None]] = {}
+        self.counters: Dict[str, Dict[int, int]] = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            start_bytes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start_wall = time.perf_counter()
+        start_cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start_wall
+            cpu = time.thread_time() - start_cpu
+            peak = tracemalloc.get_traced_memory()[1] - start_bytes if tracing else None
+            with self._lock:
+                entry = self.stages.setdefault(
+                    name, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "peak_bytes": None}
+                )
+                entry["calls"] += 1
+                entry["wall_s"] += wall
+                entry["cpu_s"] += cpu
+                if peak is not None:
+                    entry["peak_bytes"] = max(entry["peak_bytes"] or 0, peak)
+
+    def count(self, name: str, octave: int, value: int) -> None:
+        with self._lock:
+            per_octave = self.counters.setdefault(name, {})
+            per_octave[octave] = per_octave.get(octave, 0) + int(value)
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "stages": self.stages,
+            "counters": {
+                name: {str(octave): value for octave, value in sorted(per_octave.items())}
+                for name, per_octave in self.counters.items()
+            },
+        }
 
 
 # ---------------------------------------------------------------------------
@@ -94,17 +304,136 @@ def parse_args(argv: Sequence[str]) -> argparse.Namespace:
         default=1.6,
         help="Base blur applied to the images before building the pyramid",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Threads used for per-octave detection and description (1 = serial)",
+    )
+    parser.add_argument(
+        "--subpixel",
+        action="store_true",
+        help="Refine extrema to sub-pixel accuracy and drop unstable ones",
+    )
+    parser.add_argument(
+        "--max-keypoints",
+        type=int,
+        default=None,
+        help="Maximum keypoints per image, spread evenly over the image (default: unlimited)",
+    )
+    parser.add_argument(
+        "--tile-size",
+        type=int,
+        default=None,
+        help="Process octaves larger than this (pixels per side) in overlapping tiles",
+    )
+    parser.add_argument(
+        "--descriptor",
+        choices=["sift", "binary"],
+        default="sift",
+        help="Descriptor of the custom pipeline; binary uses steered BRIEF with Hamming matching",
+    )
+    parser.add_argument(
+        "--quantize",
+        action="store_true",
+        help="Also match uint8-quantized SIFT descriptors with integer distances and report "
+        "their memory and agreement with the float path (the quantized matches go to RANSAC)",
+    )
+    parser.add_argument(
+        "--compare-descriptors",
+        action="store_true",
+        help="Also run float SIFT and binary descriptors with exhaustive matching and report "
+        "their time, matches and RANSAC inliers side by side",
+    )
     parser.add_argument(
         "--ratio-test",
         type=float,
         default=0.75,
         help="Lowe's ratio test threshold for descriptor matching",
     )
+    parser.add_argument(
+        "--matcher",
+        choices=["exact", "ann"],
+        default="exact",
+        help="Descriptor matcher for the custom pipeline (ann reports recall vs exact)",
+    )
+    parser.add_argument(
+        "--ann-trees",
+        type=int,
+        default=4,
+        help="Number of randomised kd-trees used by the ann matcher",
+    )
+    parser.add_argument(
+        "--ann-checks",
+        type=int,
+        default=256,
+        help="Approximate number of descriptors compared per query by the ann matcher",
+    )
+    parser.add_argument(
+        "--cross-check",
+        action="store_true",
+        help="Keep only mutual nearest-neighbour matches (exact matcher only)",
+    )
+    parser.add_argument(
+        "--match-tile-mb",
+        type=float,
+        default=64.0,
+        help="Memory budget (MB) for one distance tile during descriptor matching",
+    )
+    parser.add_argument(
+        "--gms",
+        action="store_true",
+        help="Drop matches without grid-based motion support (GMS) before RANSAC",
+    )
+    parser.add_argument(
+        "--gms-grid", type=int, default=20, help="Cells per image side for the GMS filter"
+    )
+    parser.add_argument(
+        "--gms-alpha",
+        type=float,
+        default=6.0,
+        help="GMS threshold factor; lower keeps more matches when they are sparse",
+    )
+    parser.add_argument(
+        "--guided-matching",
+        action="store_true",
+        help="After RANSAC, match again near each keypoint's projection and re-estimate H",
+    )
+    parser.add_argument(
+        "--guided-radius",
+        type=float,
+        default=4.0,
+        help="Search radius (pixels) around the projected keypoint during guided matching",
+    )
+    parser.add_argument(
+        "--guided-ratio",
+        type=float,
+        default=0.9,
+        help="Ratio test threshold among the candidates found by guided matching",
+    )
     parser.add_argument(
         "--ransac-iters",
         type=int,
         default=2000,
-        help="RANSAC iterations used when estimating homography",
+        help="Maximum RANSAC iterations used when estimating homography",
+    )
+    parser.add_argument(
+        "--ransac-confidence",
+        type=float,
+        default=0.995,
+        help="Stop RANSAC early once this confidence is reached (1.0 runs every iteration)",
+    )
+    parser.add_argument(
+        "--ransac-sampler",
+        choices=["uniform", "prosac"],
+        default="uniform",
+        help="Hypothesis sampler; prosac draws from the lowest-distance matches first",
+    )
+    parser.add_argument(
+        "--motion-model",
+        choices=[*MOTION_MODELS, "auto"],
+        default="homography",
+        help="Transform fitted by RANSAC; auto picks the simplest model with comparable support",
     )
     parser.add_argument(
         "--ransac-threshold",
@@ -112,13 +441,43 @@ def parse_args(argv: Sequence[str]) -> argparse.Namespace:
         default=3.0,
         help="Inlier threshold (pixels) used during RANSAC",
     )
+    parser.add_argument(
+        "--ransac-seed",
+        type=int,
+        default=42,
+        help="Seed for RANSAC sampling (results are reproducible per seed)",
+    )
+    parser.add_argument(
+        "--feature-cache",
+        type=Path,
+        default=None,
+        help="Directory for cached keypoints/descriptors (disabled when omitted)",
+    )
+    parser.add_argument(
+        "--feature-cache-mb",
+        type=float,
+        default=512,
+        help="Size limit of the feature cache; least recently used entries are evicted",
+    )
+    parser.add_argument(
+        "--instrument",
+        action="store_true",
+        help="Record per-stage timings, peak memory and counters of the custom pipeline",
+    )
     parser.add_argument(
         "--output-dir",
         type=Path,
         default=Path("output/task2"),
         help="Directory that will store diagnostic artefacts",
     )
-    return parser.parse_args(argv)
+    args = parser.parse_args(argv)
+    if args.descriptor == "binary" and args.matcher == "ann":
+        parser.error("--matcher ann only supports --descriptor sift")
+    if args.quantize and (args.descriptor == "binary" or args.matcher == "ann"):
+        parser.error("--quantize only applies to --descriptor sift with --matcher exact")
+    if not args.guided_radius > 0:
+        parser.error("--guided-radius must be positive")
+    return args
 
 
 def load_image(path: Path, resize_width: int | None) -> np.ndarray:
@@ -141,6 +500,99 @@ def to_grayscale_float(image_bgr: np.ndarray) -> np.ndarray:
 # Custom SIFT implementation (simplified)
 
 
+class _TileWindow(NamedTuple):
+    """A tile cropped at octave pixel (``row``, ``col``); it owns the local
+    rows ``[top, bottom)`` and columns ``[left, right)`` of the crop."""
+
+    row: int
+    col: int
+    top: int
+    left: int
+    bottom: int
+    right: int
+
+
+class _Candidates(NamedTuple):
+    """Oriented keypoints of one level waiting for the keypoint budget.
+
+    ``patches`` are the stacked descriptor-window patches of
+    ``SIFTFromScratch._window_patches``, ``location`` is every keypoint's
+    patch and ``origins`` maps its octave coordinates into the stack.
+    """
+
+    keypoints: KeypointArray
+    patches: Tuple[np.ndarray, ...]
+    location: np.ndarray
+    origins: np.ndarray
+
+    def subset(self, mask: np.ndarray) -> "_Candidates":
+        """The keypoints selected by ``mask``.
+
+        Unused patches are dropped once they are the majority, so repeated
+        pruning copies each patch only a few times and at most twice the
+        needed patches are held.
+        """
+        if mask.all():
+            return self
+        kept = _Candidates(
+            self.keypoints[mask], self.patches, self.location[mask], self.origins[mask]
+        )
+        if not self.patches:
+            return kept
+        size = self.patches[0].shape[1]
+        used, location = np.unique(kept.location, return_inverse=True)
+        if 2 * len(used) > len(self.patches[0]) // size:
+            return kept
+        origins = kept.origins.copy()
+        origins[:, 0] += size * (kept.location - location)
+        patches = tuple(
+            patch.reshape(-1, size, size)[used].reshape(-1, size) for patch in self.patches
+        )
+        return _Candidates(kept.keypoints, patches, location, origins)
+
+
+class PyramidWorkspace:
+    """Preallocated Gaussian and DoG buffers for images of one shape and dtype.
+
+    ``gaussian[o]`` is a ``(num_scales + 3, rows, cols)`` array holding octave
+    ``o`` and ``dog[o]`` is its ``(num_scales + 2, rows, cols)`` difference
+    stack.  :class:`SIFTFromScratch` keeps one and refills it on every call
+    with an image of the same shape, so streams of equally sized images do
+    not allocate pyramid memory per frame.  Nothing returned by
+    ``detect_and_compute`` aliases these buffers.
+    """
+
+    def __init__(
+        self, image_shape: Tuple[int, int], dtype: np.dtype, num_octaves: int, num_scales: int
+    ) -> None:
+        self.image_shape = tuple(image_shape)
+        self.dtype = np.dtype(dtype)
+        self.num_octaves = num_octaves
+        self.num_scales = num_scales
+        self.gaussian: List[np.ndarray] = []
+        self.dog: List[np.ndarray] = []
+        rows, cols = self.image_shape
+        for _ in range(num_octaves):
+            self.gaussian.append(np.empty((num_scales + 3, rows, cols), dtype=self.dtype))
+            self.dog.append(np.empty((num_scales + 2, rows, cols), dtype=self.dtype))
+            # Same stopping rule as SIFTFromScratch._iter_gaussian_octaves.
+            if rows <= 16 or cols <= 16:
+                break
+            rows, cols = rows // 2, cols // 2
+
+    def fits(self, image: np.ndarray, num_octaves: int, num_scales: int) -> bool:
+        return (
+            image.shape == self.image_shape
+            and image.dtype == self.dtype
+            and num_octaves == self.num_octaves
+            and num_scales == self.num_scales
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return sum(buf.nbytes for buf in self.gaussian) + sum(buf.nbytes for buf in self.dog)
+
+
 class SIFTFromScratch:
     def __init__(
         self,
@@ -149,122 +601,753 @@ class SIFTFromScratch:
         sigma: float = 1.6,
         contrast_threshold: float = 0.04,
         edge_threshold: float = 10.0,
+        workers: int = 1,
+        observer: StageRecorder | None = None,
+        tile_size: int | None = None,
+        reuse_buffers: bool = True,
+        subpixel: bool = False,
+        max_keypoints: int | None = None,
+        descriptor: str = "sift",
+        quantize: bool = False,
     ) -> None:
         self.num_octaves = num_octaves
         self.num_scales = num_scales
         self.sigma = sigma
         self.contrast_threshold = contrast_threshold
         self.edge_threshold = edge_threshold
+        self.workers = workers
+        # Up to ``workers`` levels are processed at once; they share the gather budget.
+        self.gather_elements = max(_MAX_GATHER_ELEMENTS // max(workers, 1), 1)
+        self.observer = observer
+        self.tile_size = tile_size
+        self.reuse_buffers = reuse_buffers
+        self.subpixel = subpixel
+        if max_keypoints is not None and max_keypoints < 1:
+            raise ValueError(f"max_keypoints must be at least 1, got {max_keypoints}")
+        self.max_keypoints = max_keypoints
+        if descriptor not in ("sift", "binary"):
+            raise ValueError(f"Unknown descriptor type: {descriptor!r}")
+        self.descriptor = descriptor
+        self.quantize = quantize and descriptor == "sift"
+        self._workspace: PyramidWorkspace | None = None
 
     # ------------------------ Public API ---------------------------------
 
+    def cache_params(self) -> Dict[str, object]:
+        """Settings that affect the output, for :meth:`FeatureCache.key`."""
+        return {
+            "detector": "custom",
+            "version": _FEATURE_VERSION,
+            "num_octaves": self.num_octaves,
+            "num_scales": self.num_scales,
+            "sigma": self.sigma,
+            "contrast_threshold": self.contrast_threshold,
+            "edge_threshold": self.edge_threshold,
+            "subpixel": self.subpixel,
+            "max_keypoints": self.max_keypoints,
+            "descriptor": self.descriptor,
+            "quantize": self.quantize,
+        }
+
+    def empty_descriptors(self) -> np.ndarray:
+        """Zero-row descriptor array of the configured type."""
+        if self.descriptor == "binary":
+            return np.zeros((0, _BINARY_BITS // 8), dtype=np.uint8)
+        return np.zeros((0, 128), dtype=np.uint8 if self.quantize else np.float32)
+
     def detect_and_compute(
         self, image_gray: np.ndarray
-    ) -> Tuple[List[Keypoint], np.ndarray]:
-        base = cv2.GaussianBlur(image_gray, (0, 0), self.sigma, borderType=cv2.BORDER_REPLICATE)
-        gaussian_pyramid = self._build_gaussian_pyramid(base)
-        dog_pyramid = self._build_dog_pyramid(gaussian_pyramid)
-        keypoints = self._find_scale_space_extrema(gaussian_pyramid, dog_pyramid)
-        oriented_keypoints = self._assign_orientations(keypoints, gaussian_pyramid)
-        descriptors = self._compute_descriptors(oriented_keypoints, gaussian_pyramid)
-        return oriented_keypoints, descriptors
-
-    # ----------------------- Pyramid construction ------------------------
+    ) -> Tuple[KeypointArray, np.ndarray]:
+        """Detect keypoints and compute their descriptors.
+
+        Descriptors are 128 float32 values for ``descriptor="sift"`` (128
+        bytes with ``quantize``, see :func:`quantize_descriptors`) and 32
+        packed bytes (match them with :func:`match_descriptors_hamming`) for
+        ``descriptor="binary"``.
+
+        Each (octave, layer) is detected, oriented and described independently
+        once its octave is built.  With ``workers > 1`` those jobs run on a
+        thread pool while the next octave is being blurred; only the octave
+        chain itself is sequential.  Results are concatenated in (octave,
+        layer) order, so the output does not depend on scheduling.
+
+        With ``tile_size`` set, octaves larger than that are processed in
+        overlapping tiles (see :meth:`_iter_tiled_levels`) and the result is
+        the same as the untiled run.  Otherwise, with ``reuse_buffers``, the
+        pyramid is built in a :class:`PyramidWorkspace` kept between calls, so
+        one instance must not run ``detect_and_compute`` from two threads at once.
+
+        With ``max_keypoints`` every level is detected and oriented as soon as
+        it exists.  Only the keypoints that can still make the budget and the
+        patches their descriptors sample are kept (:meth:`_collect_candidates`),
+        so the pyramid is released as usual.  The budget is then spread over
+        the oriented keypoints by :meth:`_grid_bucket` and only the survivors
+        are described; the result never holds more than ``max_keypoints``
+        keypoints.
+        """
+        workspace = None
+        if self.reuse_buffers and not self.tile_size:
+            workspace = self._workspace_for(image_gray)
+        with self._stage("base_blur"):
+            base = cv2.GaussianBlur(
+                image_gray,
+                (0, 0),
+                self.sigma,
+                dst=None if workspace is None else workspace.gaussian[0][0],
+                borderType=cv2.BORDER_REPLICATE,
+            )
+        if self.tile_size:
+            levels = self._iter_tiled_levels(base)
+        else:
+            levels = self._iter_levels(base, workspace=workspace)
+        pool = None
+        if self.workers > 1:
+            pool = concurrent.futures.ThreadPoolExecutor(self.workers)
+        try:
+            if self.max_keypoints is None:
+                results = self._run_jobs(pool, self._process_level, levels)
+            else:
+                candidates = self._collect_candidates(pool, levels, image_gray.shape)
+                masks = self._apply_budget(
+                    [level.keypoints for level in candidates], image_gray.shape
+                )
+                results = self._run_jobs(
+                    pool,
+                    self._describe,
+                    [
+                        (level.keypoints[keep], level.patches, level.origins[keep])
+                        for level, keep in zip(candidates, masks)
+                    ],
+                )
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        keypoints = KeypointArray.concatenate([kps for kps, _ in results])
+        if not results:
+            return keypoints, self.empty_descriptors()
+        descriptors = np.concatenate([desc for _, desc in results])
+        if self.tile_size:
+            # Tiles are visited octave by octave; restore the untiled
+            # (octave, layer, row, column) order.  lexsort is stable, so the
+            # orientation peaks of one location keep their bin order.
+            order = np.lexsort((keypoints.x, keypoints.y, keypoints.layer, keypoints.octave))
+            keypoints = keypoints[order]
+            descriptors = descriptors[order]
+        return keypoints, descriptors
+
+    def _workspace_for(self, image: np.ndarray) -> PyramidWorkspace:
+        if self._workspace is None or not self._workspace.fits(
+            image, self.num_octaves, self.num_scales
+        ):
+            self._workspace = PyramidWorkspace(
+                image.shape, image.dtype, self.num_octaves, self.num_scales
+            )
+        return self._workspace
 
-    def _build_gaussian_pyramid(self, base: np.ndarray) -> List[List[np.ndarray]]:
-        pyramid: List[List[np.ndarray]] = []
+    def _iter_levels(
+        self,
+        base: np.ndarray,
+        first_octave: int = 0,
+        workspace: PyramidWorkspace | None = None,
+    ) -> Iterator[Tuple[int, int, List[np.ndarray], np.ndarray, _TileWindow | None]]:
+        """Yield every detectable (octave, layer) as soon as its octave exists."""
+        octaves = self._iter_gaussian_octaves(base, first_octave, workspace)
+        for octave_idx, gaussian_octave in enumerate(octaves, start=first_octave):
+            with self._stage("dog"):
+                dog_octave = self._build_dog_octave(
+                    gaussian_octave, None if workspace is None else workspace.dog[octave_idx]
+                )
+            for layer_idx in range(1, len(dog_octave) - 1):
+                yield octave_idx, layer_idx, gaussian_octave, dog_octave, None
+
+    def _iter_tiled_levels(
+        self, base: np.ndarray
+    ) -> Iterator[Tuple[int, int, List[np.ndarray], np.ndarray, _TileWindow | None]]:
+        """:meth:`_iter_levels` for octaves processed tile by tile.
+
+        Every octave wider or taller than ``tile_size`` is split into
+        ``tile_size`` squares.  Each is cropped from the octave base with a
+        halo (:meth:`_tile_halo`) that covers the blur chain and the largest
+        orientation/descriptor window, so its interior is identical to the
+        untiled pyramid.  A keypoint belongs to the one tile whose interior
+        contains it, which removes the duplicates in the overlaps.  The next
+        octave base is stitched from the tile interiors.  Once an octave fits
+        in one tile, the remaining octaves are processed untiled.  Only the
+        octave bases are image-sized; the pyramids scale with the tile.
+        """
+        tile = self.tile_size
+        for octave_idx in range(self.num_octaves):
+            rows, cols = base.shape
+            if rows <= tile and cols <= tile:
+                yield from self._iter_levels(base, first_octave=octave_idx)
+                return
+
+            halo = self._tile_halo(octave_idx)
+            row_src = self._halving_indices(rows)
+            col_src = self._halving_indices(cols)
+            next_base = np.empty((len(row_src), len(col_src)), dtype=base.dtype)
+            for top in range(0, rows, tile):
+                for left in range(0, cols, tile):
+                    bottom = min(top + tile, rows)
+                    right = min(left + tile, cols)
+                    row0 = max((top - halo) // _TILE_ALIGN * _TILE_ALIGN, 0)
+                    col0 = max((left - halo) // _TILE_ALIGN * _TILE_ALIGN, 0)
+                    crop = base[row0 : min(bottom + halo, rows), col0 : min(right + halo, cols)]
+                    with self._stage("gaussian_pyramid"):
+                        gaussian_octave = self._build_octave(crop)
+                    with self._stage("dog"):
+                        dog_octave = self._build_dog_octave(gaussian_octave)
+                    window = _TileWindow(
+                        row0, col0, top - row0, left - col0, bottom - row0, right - col0
+                    )
+                    for layer_idx in range(1, len(dog_octave) - 1):
+                        yield octave_idx, layer_idx, gaussian_octave, dog_octave, window
+
+                    with self._stage("gaussian_pyramid"):
+                        row_sel = (row_src >= top) & (row_src < bottom)
+                        col_sel = (col_src >= left) & (col_src < right)
+                        next_base[np.ix_(row_sel, col_sel)] = gaussian_octave[-3][
+                            np.ix_(row_src[row_sel] - row0, col_src[col_sel] - col0)
+                        ]
+            if rows <= 16 or cols <= 16:
+                return
+            base = next_base
+
+    def _tile_halo(self, octave_idx: int) -> int:
+        """Margin (octave pixels) a tile needs for its interior to match the untiled run.
+
+        Sums the radii of the octave's blur chain (OpenCV float kernels reach
+        about 4 sigma), then adds the largest orientation or rotated descriptor
+        window and the 3x3 extremum/gradient neighbourhoods.
+        """
         k = 2 ** (1 / self.num_scales)
-        sigma0 = self.sigma
+        reach = 0
+        sigma_prev = self.sigma
+        for scale_idx in range(1, self.num_scales + 3):
+            sigma_total = self.sigma * (k ** scale_idx)
+            sigma_diff = math.sqrt(max(sigma_total**2 - sigma_prev**2, 1e-6))
+            reach += (int(round(sigma_diff * 8 + 1)) | 1) // 2 + 1
+            sigma_prev = sigma_total
+        # Keypoints live on layers 1..num_scales; the last one has the largest scale.
+        scale = self.sigma * (2 ** octave_idx) * 2
+        window = max(
+            int(round(3 * scale)),
+            math.ceil(math.sqrt(2) * (int(round(8 * scale)) // 2)),
+        )
+        return reach + window + 2
 
-        for octave_idx in range(self.num_octaves):
-            octave_images: List[np.ndarray] = []
-            sigma_prev = sigma0
-            octave_images.append(base)
-            for scale_idx in range(1, self.num_scales + 3):
-                sigma_total = sigma0 * (k ** scale_idx)
-                sigma_diff = math.sqrt(max(sigma_total**2 - sigma_prev**2, 1e-6))
-                blurred = cv2.GaussianBlur(
-                    octave_images[-1],
-                    (0, 0),
-                    sigma_diff,
-                    borderType=cv2.BORDER_REPLICATE,
+    @staticmethod
+    def _halving_indices(size: int) -> np.ndarray:
+        """Source indices sampled by the INTER_NEAREST halving in the octave chain."""
+        index = np.arange(size, dtype=np.float32)[None, :]
+        halved = cv2.resize(index, (size // 2, 1), interpolation=cv2.INTER_NEAREST)
+        return halved[0].astype(np.intp)
+
+    def _process_level(
+        self,
+        octave_idx: int,
+        layer_idx: int,
+        gaussian_octave: List[np.ndarray],
+        dog_octave: np.ndarray,
+        window: _TileWindow | None = None,
+    ) -> Tuple[KeypointArray, np.ndarray]:
+        """Detection, orientation and descriptors for a single pyramid level.
+
+        For a tile, only keypoints in ``window``'s interior are kept.  They come
+        back from detection in full-image coordinates and the crop origin is
+        handed to the sampling code, so every rounding step sees the same
+        values as in the untiled run.
+        """
+        keypoints = self._detect_level(octave_idx, layer_idx, dog_octave, window)
+        if len(keypoints) == 0:
+            return keypoints, self.empty_descriptors()
+        oriented, source, origin = self._orient_level(
+            octave_idx, layer_idx, gaussian_octave, keypoints, window
+        )
+        return self._describe(oriented, source, origin)
+
+    def _candidate_level(
+        self,
+        octave_idx: int,
+        layer_idx: int,
+        gaussian_octave: List[np.ndarray],
+        dog_octave: np.ndarray,
+        window: _TileWindow | None = None,
+        *,
+        image_shape: Tuple[int, int],
+    ) -> _Candidates:
+        """Oriented keypoints of one level and the patches their descriptors sample.
+
+        The budgeted counterpart of :meth:`_process_level`: descriptors wait
+        until every level has been seen, so only the keypoints this level
+        alone does not rule out (:meth:`_grid_contenders`) and their patches
+        from :meth:`_window_patches` are kept instead of the level.
+        """
+        keypoints = self._detect_level(octave_idx, layer_idx, dog_octave, window)
+        if len(keypoints) == 0:
+            return _Candidates(
+                keypoints, (), np.zeros(0, dtype=np.intp), np.zeros((0, 2), dtype=np.intp)
+            )
+        oriented, source, origin = self._orient_level(
+            octave_idx, layer_idx, gaussian_octave, keypoints, window
+        )
+        with self._stage("budget"):
+            keep = self._grid_contenders(oriented, image_shape, self.max_keypoints)
+        self._count_rejected_budget(oriented[~keep])
+        oriented = oriented[keep]
+        return _Candidates(oriented, *self._window_patches(oriented, source, origin))
+
+    def _orient_level(
+        self,
+        octave_idx: int,
+        layer_idx: int,
+        gaussian_octave: List[np.ndarray],
+        keypoints: KeypointArray,
+        window: _TileWindow | None = None,
+    ) -> Tuple[KeypointArray, Tuple[np.ndarray, ...], Tuple[int, int]]:
+        """Orientation peaks of keypoints detected on one level.
+
+        Also returns the images their descriptors sample, (magnitude, angle)
+        for SIFT and the Gaussian level for binary descriptors, and where those
+        images start within the octave.
+        """
+        origin = (0, 0) if window is None else (window.row, window.col)
+        with self._stage("gradients"):
+            gradients = self._gradient_level(gaussian_octave[layer_idx])
+        with self._stage("orientation"):
+            oriented = self._assign_orientations(
+                keypoints, {(octave_idx, layer_idx): gradients}, origin
+            )
+        self._count("orientation_peaks", octave_idx, len(oriented))
+        if self.descriptor == "binary":
+            return oriented, (gaussian_octave[layer_idx],), origin
+        return oriented, gradients, origin
+
+    def _describe(
+        self,
+        keypoints: KeypointArray,
+        source: Tuple[np.ndarray, ...],
+        origin: Tuple[int, int] | np.ndarray,
+    ) -> Tuple[KeypointArray, np.ndarray]:
+        """Descriptors of oriented keypoints from one level, sampled from ``source``.
+
+        ``origin`` is the (row, col) of ``source`` within the octave, or one
+        such pair per keypoint.
+        """
+        if len(keypoints) == 0:
+            return keypoints, self.empty_descriptors()
+        octave_idx = int(keypoints.octave[0])
+        with self._stage("descriptors"):
+            if self.descriptor == "binary":
+                descriptors = self._compute_binary_descriptors(keypoints, source[0], origin)
+            else:
+                level = (octave_idx, int(keypoints.layer[0]))
+                descriptors = self._compute_descriptors(keypoints, {level: source}, origin)
+                if self.quantize:
+                    descriptors = quantize_descriptors(descriptors)
+        self._count("descriptors", octave_idx, len(descriptors))
+        return keypoints, descriptors
+
+    @staticmethod
+    def _window_patches(
+        keypoints: KeypointArray, source: Tuple[np.ndarray, ...], origin: Tuple[int, int]
+    ) -> Tuple[Tuple[np.ndarray, ...], np.ndarray, np.ndarray]:
+        """Square patches of ``source`` covering each keypoint's rotated descriptor window.
+
+        One patch is cut per location (the orientation peaks of a location are
+        adjacent) with the indices clamped like the samplers' own, and the
+        patches are stacked into one tall image per source image.  Returns the
+        stacks, each keypoint's patch index and the per-keypoint origins that
+        map octave coordinates into that patch, so descriptors sampled from
+        the stacks equal those from the level.
+        """
+        scale = 2 ** int(keypoints.octave[0])
+        cx = np.rint(keypoints.x.astype(np.float64) / scale).astype(np.intp)
+        cy = np.rint(keypoints.y.astype(np.float64) / scale).astype(np.intp)
+        # Samples lie within sqrt(2) half-widths of the centre, plus one for rounding.
+        half_width = int(np.rint(8 * keypoints.sigma.astype(np.float64)).max()) // 2
+        radius = math.ceil(math.sqrt(2) * half_width) + 1
+        size = 2 * radius + 1
+        first = np.r_[True, (cx[1:] != cx[:-1]) | (cy[1:] != cy[:-1])]
+        location = np.cumsum(first) - 1
+        offsets = np.arange(-radius, radius + 1)
+        rows, cols = source[0].shape
+        yy = np.clip(cy[first, None] - origin[0] + offsets, 0, rows - 1)
+        xx = np.clip(cx[first, None] - origin[1] + offsets, 0, cols - 1)
+        patches = tuple(
+            image[yy[:, :, None], xx[:, None, :]].reshape(-1, size) for image in source
+        )
+        origins = np.stack([cy - radius - size * location, cx - radius], axis=1)
+        return patches, location, origins
+
+    def _collect_candidates(
+        self,
+        pool: concurrent.futures.Executor | None,
+        levels: Iterator[Tuple[int, int, List[np.ndarray], np.ndarray, _TileWindow | None]],
+        image_shape: Tuple[int, int],
+    ) -> List[_Candidates]:
+        """:meth:`_candidate_level` for every level, pruned as the results arrive.
+
+        After each level only the keypoints that :meth:`_grid_contenders`
+        still admits, and their patches, are kept.  That is at most about
+        twice ``max_keypoints`` whatever the image, so the patches stay small.
+        """
+        job = functools.partial(self._candidate_level, image_shape=image_shape)
+        found: Dict[int, _Candidates] = {}
+        for index, level in self._iter_jobs(pool, job, levels):
+            found[index] = level
+            keypoints = KeypointArray.concatenate([kept.keypoints for kept in found.values()])
+            if len(keypoints) <= self.max_keypoints:
+                continue
+            with self._stage("budget"):
+                keep = self._grid_contenders(keypoints, image_shape, self.max_keypoints)
+            self._count_rejected_budget(keypoints[~keep])
+            splits = np.cumsum([len(kept.keypoints) for kept in found.values()], dtype=np.intp)
+            found = {
+                kept_index: kept.subset(mask)
+                for (kept_index, kept), mask in zip(found.items(), np.split(keep, splits[:-1]))
+            }
+        return [found[index] for index in sorted(found)]
+
+    def _run_jobs(
+        self,
+        pool: concurrent.futures.Executor | None,
+        fn: Callable[..., object],
+        jobs: Iterator[tuple] | List[tuple],
+    ) -> List[object]:
+        """``[fn(*job) for job in jobs]``, run through :meth:`_iter_jobs`."""
+        results = dict(self._iter_jobs(pool, fn, jobs))
+        return [results[index] for index in range(len(results))]
+
+    def _iter_jobs(
+        self,
+        pool: concurrent.futures.Executor | None,
+        fn: Callable[..., object],
+        jobs: Iterator[tuple] | List[tuple],
+    ) -> Iterator[Tuple[int, object]]:
+        """``(index, fn(*job))`` for every job, in completion order.
+
+        With a pool at most ``workers`` jobs are pending, and the next job is
+        only drawn from ``jobs`` once one of them finishes.  A lazy level
+        iterator therefore builds pyramids at the pool's pace, and only the
+        pyramids of about ``workers`` levels (tiles, in tiled mode) are alive
+        instead of every tile's.
+        """
+        if pool is None:
+            for index, job in enumerate(jobs):
+                yield index, fn(*job)
+            return
+        pending: Dict[concurrent.futures.Future, int] = {}
+        for index, job in enumerate(jobs):
+            if len(pending) >= self.workers:
+                done, _ = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
                 )
-                octave_images.append(blurred)
-                sigma_prev = sigma_total
-            pyramid.append(octave_images)
+                for future in done:
+                    yield pending.pop(future), future.result()
+            pending[pool.submit(fn, *job)] = index
+        for future in concurrent.futures.as_completed(list(pending)):
+            yield pending.pop(future), future.result()
+
+    def _apply_budget(
+        self, levels: List[KeypointArray], image_shape: Tuple[int, int]
+    ) -> List[np.ndarray]:
+        """Per-level masks keeping ``max_keypoints`` oriented keypoints in total."""
+        keypoints = KeypointArray.concatenate(levels)
+        keep = np.ones(len(keypoints), dtype=bool)
+        if len(keypoints) > self.max_keypoints:
+            with self._stage("budget"):
+                keep[:] = False
+                keep[self._grid_bucket(keypoints, image_shape, self.max_keypoints)] = True
+            self._count_rejected_budget(keypoints[~keep])
+        splits = np.cumsum([len(level) for level in levels], dtype=np.intp)[:-1]
+        return np.split(keep, splits)
+
+    def _count_rejected_budget(self, rejected: KeypointArray) -> None:
+        if self.observer is not None:
+            dropped = np.bincount(rejected.octave, minlength=self.num_octaves)
+            for octave_idx, count in enumerate(dropped.tolist()):
+                self._count("rejected_budget", octave_idx, count)
+
+    @classmethod
+    def _grid_bucket(
+        cls, keypoints: KeypointArray, image_shape: Tuple[int, int], count: int
+    ) -> np.ndarray:
+        """Sorted indices of ``count`` keypoints spread over a grid of ~``count`` cells.
+
+        Keypoints are ranked by |response| inside their cell (:meth:`_grid_ranks`)
+        and taken rank by rank (every cell's strongest, then every cell's
+        second, ...), strongest first within a rank.  Dense regions cannot
+        starve sparse ones and the whole budget is used.  Position, then
+        orientation, breaks ties, so the choice does not depend on the input
+        order.
+        """
+        rank = cls._grid_ranks(keypoints, image_shape, count)
+        strength = -np.abs(keypoints.response)
+        chosen = np.lexsort((keypoints.orientation, keypoints.x, keypoints.y, strength, rank))
+        return np.sort(chosen[:count])
+
+    @classmethod
+    def _grid_contenders(
+        cls, keypoints: KeypointArray, image_shape: Tuple[int, int], count: int
+    ) -> np.ndarray:
+        """Mask of the keypoints that :meth:`_grid_bucket` may still choose once
+        more keypoints are added.
+
+        Added keypoints can only push ranks up, and a cell's ``r`` best stay
+        ahead of everything it ranks ``r`` or worse.  So once ``count``
+        keypoints rank below ``r``, nothing ranked ``r`` or worse can be chosen.
+        The rest are at most ``count`` plus one per grid cell.
+        """
+        if len(keypoints) <= count:
+            return np.ones(len(keypoints), dtype=bool)
+        rank = cls._grid_ranks(keypoints, image_shape, count)
+        return rank <= np.partition(rank, count - 1)[count - 1]
+
+    @staticmethod
+    def _grid_ranks(
+        keypoints: KeypointArray, image_shape: Tuple[int, int], count: int
+    ) -> np.ndarray:
+        """Rank of every keypoint by |response| within its cell of a ~``count``-cell grid."""
+        rows, cols = image_shape
+        cell = max(math.sqrt(rows * cols / count), 1.0)
+        grid_cols = int(math.ceil(cols / cell))
+        cell_ids = (keypoints.y // cell).astype(np.int64) * grid_cols + (
+            keypoints.x // cell
+        ).astype(np.int64)
+        strength = -np.abs(keypoints.response)
+
+        order = np.lexsort((keypoints.orientation, keypoints.x, keypoints.y, strength, cell_ids))
+        sorted_cells = cell_ids[order]
+        run_starts = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+        run_lengths = np.diff(np.r_[run_starts, len(order)])
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order)) - np.repeat(run_starts, run_lengths)
+        return rank
+
+    def _stage(self, name: str) -> ContextManager[None]:
+        if self.observer is None:
+            return contextlib.nullcontext()
+        return self.observer.stage(name)
+
+    def _count(self, name: str, octave: int, value: int) -> None:
+        if self.observer is not None:
+            self.observer.count(name, octave, value)
+
+    # ----------------------- Pyramid construction ------------------------
+
+    def _iter_gaussian_octaves(
+        self,
+        base: np.ndarray,
+        first_octave: int = 0,
+        workspace: PyramidWorkspace | None = None,
+    ) -> Iterator[List[np.ndarray]]:
+        """Octaves from ``first_octave`` on; ``workspace`` (indexed from octave 0)
+        receives every level when given."""
+        for octave_idx in range(first_octave, self.num_octaves):
+            with self._stage("gaussian_pyramid"):
+                octave_images = self._build_octave(
+                    base, None if workspace is None else workspace.gaussian[octave_idx]
+                )
+            yield octave_images
 
             # Prepare base for next octave (downsample by factor of 2)
             next_base = octave_images[-3]
             height, width = next_base.shape
-            if height <= 16 or width <= 16:
+            if height <= 16 or width <= 16 or octave_idx + 1 == self.num_octaves:
                 break
-            base = cv2.resize(
-                next_base,
-                (width // 2, height // 2),
-                interpolation=cv2.INTER_NEAREST,
-            )
-
-        return pyramid
+            with self._stage("gaussian_pyramid"):
+                base = cv2.resize(
+                    next_base,
+                    (width // 2, height // 2),
+                    dst=None if workspace is None else workspace.gaussian[octave_idx + 1][0],
+                    interpolation=cv2.INTER_NEAREST,
+                )
 
-    def _build_dog_pyramid(
-        self, gaussian_pyramid: List[List[np.ndarray]]
-    ) -> List[List[np.ndarray]]:
-        dog_pyramid: List[List[np.ndarray]] = []
-        for octave in gaussian_pyramid:
-            dog_octave = []
-            for i in range(1, len(octave)):
-                dog_octave.append(octave[i] - octave[i - 1])
-            dog_pyramid.append(dog_octave)
-        return dog_pyramid
+    def _build_octave(self, base: np.ndarray, out: np.ndarray | None = None) -> List[np.ndarray]:
+        """Gaussian levels of one octave; level ``i > 0`` is blurred into ``out[i]``
+        when a buffer stack is given (``base`` itself is used as level 0)."""
+        k = 2 ** (1 / self.num_scales)
+        sigma0 = self.sigma
+        octave_images: List[np.ndarray] = []
+        sigma_prev = sigma0
+        octave_images.append(base)
+        for scale_idx in range(1, self.num_scales + 3):
+            sigma_total = sigma0 * (k ** scale_idx)
+            sigma_diff = math.sqrt(max(sigma_total**2 - sigma_prev**2, 1e-6))
+            blurred = cv2.GaussianBlur(
+                octave_images[-1],
+                (0, 0),
+                sigma_diff,
+                dst=None if out is None else out[scale_idx],
+                borderType=cv2.BORDER_REPLICATE,
+            )
+            octave_images.append(blurred)
+            sigma_prev = sigma_total
+        return octave_images
+
+    @staticmethod
+    def _build_dog_octave(octave: List[np.ndarray], out: np.ndarray | None = None) -> np.ndarray:
+        """Differences of adjacent Gaussian levels, stacked as (layers, H, W)."""
+        dog_octave = out
+        if dog_octave is None:
+            dog_octave = np.empty((len(octave) - 1,) + octave[0].shape, dtype=octave[0].dtype)
+        for i in range(1, len(octave)):
+            np.subtract(octave[i], octave[i - 1], out=dog_octave[i - 1])
+        return dog_octave
+
+    @staticmethod
+    def _gradient_level(image: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Gradient magnitude and orientation (degrees in [0, 360)) of one level.
+
+        Border pixels get zero magnitude so they contribute nothing to the
+        orientation histograms or descriptors, matching the old bounds checks.
+        The orientation stays float64, like the old per-sample ``math.atan2``:
+        rounded to float32, angles next to a bin edge can move to the
+        neighbouring orientation or descriptor bin.
+        """
+        gx = np.zeros(image.shape, dtype=np.float64)
+        gy = np.zeros(image.shape, dtype=np.float64)
+        gx[1:-1, 1:-1] = image[1:-1, 2:] - image[1:-1, :-2]
+        gy[1:-1, 1:-1] = image[:-2, 1:-1] - image[2:, 1:-1]
+        magnitude = np.sqrt(gx * gx + gy * gy).astype(np.float32)
+        orientation = np.degrees(np.arctan2(gy, gx)) % 360
+        return magnitude, orientation
 
     # ----------------------- Keypoint detection --------------------------
 
-    def _find_scale_space_extrema(
+    def _detect_level(
         self,
-        gaussian_pyramid: List[List[np.ndarray]],
-        dog_pyramid: List[List[np.ndarray]],
-    ) -> List[Keypoint]:
-        keypoints: List[Keypoint] = []
-        threshold = self.contrast_threshold / self.num_scales
-
-        for octave_idx, dog_octave in enumerate(dog_pyramid):
-            for layer_idx in range(1, len(dog_octave) - 1):
-                prev_img = dog_octave[layer_idx - 1]
-                curr_img = dog_octave[layer_idx]
-                next_img = dog_octave[layer_idx + 1]
-                rows, cols = curr_img.shape
-                for y in range(1, rows - 1):
-                    for x in range(1, cols - 1):
-                        value = curr_img[y, x]
-                        if abs(value) < threshold:
-                            continue
-                        patch = np.concatenate(
-                            [
-                                prev_img[y - 1 : y + 2, x - 1 : x + 2].ravel(),
-                                curr_img[y - 1 : y + 2, x - 1 : x + 2].ravel(),
-                                next_img[y - 1 : y + 2, x - 1 : x + 2,].ravel(),
-                            ]
-                        )
-                        if value > 0 and value != patch.max():
-                            continue
-                        if value < 0 and value != patch.min():
-                            continue
-                        if self._is_edge_response(curr_img, x, y):
-                            continue
-                        sigma = self.sigma * (2 ** octave_idx) * (2 ** (layer_idx / self.num_scales))
-                        kp = Keypoint(
-                            x=x * (2**octave_idx),
-                            y=y * (2**octave_idx),
-                            octave=octave_idx,
-                            layer=layer_idx,
-                            sigma=sigma,
-                            orientation=0.0,
-                        )
-                        keypoints.append(kp)
-
+        octave_idx: int,
+        layer_idx: int,
+        dog_octave: np.ndarray,
+        window: _TileWindow | None = None,
+    ) -> KeypointArray:
+        """Contrast- and edge-filtered 26-neighbour extrema of one DoG layer.
+
+        Only pixels inside ``window`` (the whole layer when ``None``) are
+        candidates; the outermost rows and columns never are.  Coordinates
+        are returned in full-image pixels.  With ``subpixel`` the extrema are
+        pre-filtered at half the contrast threshold, refined by
+        :meth:`_refine_extrema`, and the full threshold is applied to the
+        interpolated value.
+        """
+        rows, cols = dog_octave.shape[1:]
+        if rows < 3 or cols < 3:
+            return KeypointArray.empty()
+        threshold = max(self.contrast_threshold / self.num_scales, 0.0)
+        kernel = np.ones((3, 3), dtype=np.uint8)
+        top, left, bottom, right = (0, 0, rows, cols) if window is None else window[2:]
+        row0, row1 = max(top, 1), min(bottom, rows - 1)
+        col0, col1 = max(left, 1), min(right, cols - 1)
+
+        with self._stage("extrema"):
+            # 26-neighbour extrema: max/min across the adjacent layers, then the
+            # 3x3 max/min of that.  The centre is part of its own neighbourhood,
+            # so ">=" reproduces the "value == patch.max()" test.
+            prev_img, curr_img, next_img = dog_octave[layer_idx - 1 : layer_idx + 2]
+            neigh_max = np.maximum(prev_img, curr_img)
+            np.maximum(neigh_max, next_img, out=neigh_max)
+            cv2.dilate(neigh_max, kernel, dst=neigh_max)
+            neigh_min = np.minimum(prev_img, curr_img)
+            np.minimum(neigh_min, next_img, out=neigh_min)
+            cv2.erode(neigh_min, kernel, dst=neigh_min)
+
+            inner = curr_img[row0:row1, col0:col1]
+            is_max = inner >= neigh_max[row0:row1, col0:col1]
+            is_min = inner <= neigh_min[row0:row1, col0:col1]
+            prefilter = 0.5 * threshold if self.subpixel else threshold
+            candidates = (is_max & (inner >= prefilter)) | (is_min & (inner <= -prefilter))
+            if threshold == 0:
+                candidates |= inner == 0
+            ys, xs = np.nonzero(candidates)
+            ys += row0
+            xs += col0
+            if self.observer is not None:
+                examined = np.count_nonzero(is_max | is_min | candidates)
+                self._count("extrema_candidates", octave_idx, examined)
+                self._count("rejected_contrast", octave_idx, examined - ys.size)
+
+        if ys.size == 0:
+            return KeypointArray.empty()
+        offsets = np.zeros((ys.size, 3))
+        response = curr_img[ys, xs]
+        if self.subpixel:
+            with self._stage("subpixel"):
+                offsets, response = self._refine_extrema(dog_octave, layer_idx, xs, ys)
+                stable = np.all(np.abs(offsets) <= 0.5, axis=1)
+                strong = np.abs(response) >= threshold
+                keep = stable & strong
+                xs, ys, offsets, response = xs[keep], ys[keep], offsets[keep], response[keep]
+            self._count("rejected_offset", octave_idx, np.count_nonzero(~stable))
+            self._count("rejected_contrast", octave_idx, np.count_nonzero(stable & ~strong))
+
+        with self._stage("edge_rejection"):
+            keep = ~self._is_edge_response(curr_img, xs, ys)
+            xs, ys, offsets, response = xs[keep], ys[keep], offsets[keep], response[keep]
+        count = len(xs)
+        self._count("rejected_edge", octave_idx, keep.size - count)
+        self._count("keypoints", octave_idx, count)
+        # Keypoints stay on their layer's scale (the scale offset only feeds
+        # the stability test) so orientation/descriptors can batch per level.
+        row, col = (0, 0) if window is None else (window.row, window.col)
+        sigma = self.sigma * (2 ** octave_idx) * (2 ** (layer_idx / self.num_scales))
+        keypoints = KeypointArray(
+            x=(xs + col + offsets[:, 0]) * (2**octave_idx),
+            y=(ys + row + offsets[:, 1]) * (2**octave_idx),
+            octave=np.full(count, octave_idx),
+            layer=np.full(count, layer_idx),
+            sigma=np.full(count, sigma),
+            orientation=np.zeros(count),
+            response=response,
+        )
+        if self.subpixel:
+            # Keep row-major order in refined coordinates, which is also the
+            # order the tiled mode restores.
+            keypoints = keypoints[np.lexsort((keypoints.x, keypoints.y))]
         return keypoints
 
-    def _is_edge_response(self, image: np.ndarray, x: int, y: int) -> bool:
+    @staticmethod
+    def _refine_extrema(
+        dog_octave: np.ndarray, layer_idx: int, xs: np.ndarray, ys: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """One quadratic (Taylor) fit per extremum, with all 3x3 systems solved together.
+
+        Returns the ``(x, y, scale)`` offsets of the fitted extremum and the DoG
+        value interpolated there.  Singular Hessians get infinite offsets.
+        """
+        below, centre, above = dog_octave[layer_idx - 1 : layer_idx + 2]
+
+        def at(image: np.ndarray, dy: int, dx: int) -> np.ndarray:
+            return image[ys + dy, xs + dx].astype(np.float64)
+
+        value = at(centre, 0, 0)
+        right, left = at(centre, 0, 1), at(centre, 0, -1)
+        down, up = at(centre, 1, 0), at(centre, -1, 0)
+        next_val, prev_val = at(above, 0, 0), at(below, 0, 0)
+        gradient = np.stack(
+            [(right - left) / 2, (down - up) / 2, (next_val - prev_val) / 2], axis=1
+        )
+        dxx = right + left - 2 * value
+        dyy = down + up - 2 * value
+        dss = next_val + prev_val - 2 * value
+        dxy = (at(centre, 1, 1) - at(centre, 1, -1) - at(centre, -1, 1) + at(centre, -1, -1)) / 4
+        dxs = (at(above, 0, 1) - at(above, 0, -1) - at(below, 0, 1) + at(below, 0, -1)) / 4
+        dys = (at(above, 1, 0) - at(above, -1, 0) - at(below, 1, 0) + at(below, -1, 0)) / 4
+        hessian = np.stack([dxx, dxy, dxs, dxy, dyy, dys, dxs, dys, dss], axis=1).reshape(-1, 3, 3)
+
+        offsets = np.full((len(xs), 3), np.inf)
+        solvable = np.linalg.det(hessian) != 0
+        offsets[solvable] = -np.linalg.solve(
+            hessian[solvable], gradient[solvable][:, :, None]
+        )[:, :, 0]
+        finite = np.where(np.isfinite(offsets), offsets, 0)
+        return offsets, value + 0.5 * np.einsum("ij,ij->i", gradient, finite)
+
+    def _is_edge_response(
+        self, image: np.ndarray, x: int | np.ndarray, y: int | np.ndarray
+    ) -> bool | np.ndarray:
+        """Hessian edge test; ``x``/``y`` may be scalars or index arrays."""
         dxx = image[y, x + 1] + image[y, x - 1] - 2 * image[y, x]
         dyy = image[y + 1, x] + image[y - 1, x] - 2 * image[y, x]
         dxy = (
@@ -275,225 +1358,1448 @@ class SIFTFromScratch:
         )
         tr = dxx + dyy
         det = dxx * dyy - dxy**2
-        if det <= 0:
-            return True
         r = (self.edge_threshold + 1) ** 2 / self.edge_threshold
-        return (tr * tr) * r >= det
+        return (det <= 0) | ((tr * tr) >= r * det)
 
     # ----------------------- Orientation assignment ----------------------
 
     def _assign_orientations(
-        self, keypoints: List[Keypoint], gaussian_pyramid: List[List[np.ndarray]]
-    ) -> List[Keypoint]:
-        oriented: List[Keypoint] = []
-        for kp in keypoints:
-            octave_images = gaussian_pyramid[kp.octave]
-            gaussian_img = octave_images[kp.layer]
-            scale = kp.sigma
-            radius = int(round(3 * scale))
-            weight_factor = -0.5 / (scale**2)
-            hist = np.zeros(36, dtype=np.float32)
-
-            x = int(round(kp.x / (2**kp.octave)))
-            y = int(round(kp.y / (2**kp.octave)))
-
-            rows, cols = gaussian_img.shape
-            for dy in range(-radius, radius + 1):
-                yy = y + dy
-                if yy <= 0 or yy >= rows - 1:
-                    continue
-                for dx in range(-radius, radius + 1):
-                    xx = x + dx
-                    if xx <= 0 or xx >= cols - 1:
-                        continue
-                    gx = gaussian_img[yy, xx + 1] - gaussian_img[yy, xx - 1]
-                    gy = gaussian_img[yy - 1, xx] - gaussian_img[yy + 1, xx]
-                    magnitude = math.sqrt(gx * gx + gy * gy)
-                    orientation = math.degrees(math.atan2(gy, gx)) % 360
-                    weight = math.exp(weight_factor * (dx * dx + dy * dy))
-                    bin_idx = int(round(orientation / 10)) % 36
-                    hist[bin_idx] += weight * magnitude
-
-            max_val = hist.max()
-            if max_val == 0:
-                continue
-            for bin_idx, value in enumerate(hist):
-                if value >= 0.8 * max_val:
-                    angle = (bin_idx * 10) % 360
-                    oriented.append(
-                        Keypoint(
-                            x=kp.x,
-                            y=kp.y,
-                            octave=kp.octave,
-                            layer=kp.layer,
-                            sigma=kp.sigma,
-                            orientation=math.radians(angle),
-                        )
-                    )
+        self,
+        keypoints: KeypointArray,
+        gradient_pyramid: Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray]],
+        origin: Tuple[int, int] = (0, 0),
+    ) -> KeypointArray:
+        """``origin`` is the (row, col) of the gradient images within their octave."""
+        if len(keypoints) == 0:
+            return keypoints
+        xs = keypoints.x.astype(np.float64)
+        ys = keypoints.y.astype(np.float64)
+        peak_ids: List[np.ndarray] = []
+        peak_bins: List[np.ndarray] = []
+        for (octave, layer, scale), ids in self._group_by_level(keypoints).items():
+            magnitude_img, angle_img = gradient_pyramid[octave, layer]
+            cx = np.rint(xs[ids] / (2**octave)).astype(np.intp) - origin[1]
+            cy = np.rint(ys[ids] / (2**octave)).astype(np.intp) - origin[0]
+            hist = self._orientation_histograms(
+                magnitude_img, angle_img, cx, cy, scale, self.gather_elements
+            )
 
+            # Every bin within 80% of the histogram peak spawns a keypoint.
+            max_val = hist.max(axis=1, keepdims=True)
+            peaks = (hist >= 0.8 * max_val) & (max_val > 0)
+            rows, bins = np.nonzero(peaks)
+            peak_ids.append(ids[rows])
+            peak_bins.append(bins)
+
+        all_ids = np.concatenate(peak_ids)
+        all_bins = np.concatenate(peak_bins)
+        order = np.lexsort((all_bins, all_ids))
+        oriented = keypoints[all_ids[order]]
+        oriented.orientation = ((all_bins[order] * 10) % 360).astype(np.float32)
         return oriented
 
+    @staticmethod
+    def _group_by_level(
+        keypoints: KeypointArray,
+    ) -> Dict[Tuple[int, int, float], np.ndarray]:
+        """Indices of keypoints sharing a pyramid level and scale (same window)."""
+        keys = np.rec.fromarrays([keypoints.octave, keypoints.layer, keypoints.sigma])
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        order = np.argsort(inverse, kind="stable")
+        splits = np.cumsum(np.bincount(inverse.ravel(), minlength=len(unique_keys)))[:-1]
+        return {
+            (int(octave), int(layer), float(sigma)): ids
+            for (octave, layer, sigma), ids in zip(unique_keys.tolist(), np.split(order, splits))
+        }
+
+    @staticmethod
+    def _orientation_histograms(
+        magnitude_img: np.ndarray,
+        angle_img: np.ndarray,
+        cx: np.ndarray,
+        cy: np.ndarray,
+        scale: float,
+        gather_elements: int = _MAX_GATHER_ELEMENTS,
+    ) -> np.ndarray:
+        """36-bin orientation histograms for keypoints sharing one level and scale."""
+        radius = int(round(3 * scale))
+        offsets = np.arange(-radius, radius + 1)
+        dy, dx = np.meshgrid(offsets, offsets, indexing="ij")
+        dy = dy.ravel()
+        dx = dx.ravel()
+        weights = np.exp((-0.5 / (scale**2)) * (dx * dx + dy * dy))
+        rows, cols = magnitude_img.shape
+
+        count = len(cx)
+        hist = np.zeros((count, 36), dtype=np.float32)
+        chunk = max(1, gather_elements // weights.size)
+        for start in range(0, count, chunk):
+            stop = min(start + chunk, count)
+            # Out-of-image samples are clamped onto the border, whose gradient
+            # magnitude is zero, so they add nothing to the histogram.
+            yy = np.clip(cy[start:stop, None] + dy, 0, rows - 1)
+            xx = np.clip(cx[start:stop, None] + dx, 0, cols - 1)
+            bins = np.rint(angle_img[yy, xx] / 10).astype(np.intp) % 36
+            bins += 36 * np.arange(stop - start)[:, None]
+            sums = np.bincount(
+                bins.ravel(),
+                weights=(magnitude_img[yy, xx] * weights).ravel(),
+                minlength=(stop - start) * 36,
+            )
+            hist[start:stop] = sums.reshape(-1, 36)
+        return hist
+
     # ----------------------- Descriptor computation ----------------------
 
     def _compute_descriptors(
-        self, keypoints: List[Keypoint], gaussian_pyramid: List[List[np.ndarray]]
+        self,
+        keypoints: KeypointArray,
+        gradient_pyramid: Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray]],
+        origin: Tuple[int, int] | np.ndarray = (0, 0),
     ) -> np.ndarray:
-        descriptors: List[np.ndarray] = []
-        for kp in keypoints:
-            octave_img = gaussian_pyramid[kp.octave][kp.layer]
-            kp_scale = kp.sigma
-            cos_o = math.cos(kp.orientation)
-            sin_o = math.sin(kp.orientation)
-            rows, cols = octave_img.shape
-
-            descriptor = np.zeros((4, 4, 8), dtype=np.float32)
-            window_size = int(round(8 * kp_scale))
-            half_width = window_size // 2
-
-            base_x = kp.x / (2**kp.octave)
-            base_y = kp.y / (2**kp.octave)
-
-            for dy in range(-half_width, half_width):
-                for dx in range(-half_width, half_width):
-                    # Rotate relative coordinates
-                    rx = (cos_o * dx - sin_o * dy) + base_x
-                    ry = (sin_o * dx + cos_o * dy) + base_y
-                    ix, iy = int(round(rx)), int(round(ry))
-                    if iy <= 0 or iy >= rows - 1 or ix <= 0 or ix >= cols - 1:
-                        continue
-                    gx = octave_img[iy, ix + 1] - octave_img[iy, ix - 1]
-                    gy = octave_img[iy - 1, ix] - octave_img[iy + 1, ix]
-                    magnitude = math.sqrt(gx * gx + gy * gy)
-                    theta = (math.degrees(math.atan2(gy, gx)) - math.degrees(kp.orientation)) % 360
-
-                    weight = math.exp(-((dx**2 + dy**2) / (2 * (0.5 * window_size) ** 2)))
-                    magnitude *= weight
-
-                    cell_x = int(
-                        math.floor(
-                            ((cos_o * dx - sin_o * dy) + half_width) / (half_width / 2 + 1e-5)
-                        )
-                    )
-                    cell_y = int(
-                        math.floor(
-                            ((sin_o * dx + cos_o * dy) + half_width) / (half_width / 2 + 1e-5)
-                        )
-                    )
-                    if cell_x < 0 or cell_x >= 4 or cell_y < 0 or cell_y >= 4:
-                        continue
-                    bin_idx = int(round(theta / 45)) % 8
-                    descriptor[cell_y, cell_x, bin_idx] += magnitude
+        """``origin`` is the (row, col) of the gradient images, or one pair per keypoint."""
+        descriptors = np.zeros((len(keypoints), 128), dtype=np.float32)
+        if len(keypoints) == 0:
+            return descriptors
+        origins = np.broadcast_to(np.asarray(origin, dtype=np.intp), (len(keypoints), 2))
+        xs = keypoints.x.astype(np.float64)
+        ys = keypoints.y.astype(np.float64)
+        orientations = keypoints.orientation.astype(np.float64)
+
+        for (octave, layer, scale), ids in self._group_by_level(keypoints).items():
+            magnitude_img, angle_img = gradient_pyramid[octave, layer]
+            descriptors[ids] = self._descriptor_histograms(
+                magnitude_img,
+                angle_img,
+                xs[ids] / (2**octave),
+                ys[ids] / (2**octave),
+                orientations[ids],
+                scale,
+                origins[ids],
+                self.gather_elements,
+            )
 
-            vec = descriptor.ravel()
-            norm = np.linalg.norm(vec)
-            if norm > 1e-6:
-                vec = vec / norm
-                vec = np.clip(vec, 0, 0.2)
-                vec = vec / (np.linalg.norm(vec) + 1e-6)
-            descriptors.append(vec)
+        norms = np.linalg.norm(descriptors, axis=1)
+        valid = norms > 1e-6
+        vecs = descriptors[valid] / norms[valid, None]
+        vecs = np.clip(vecs, 0, 0.2)
+        vecs /= np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-6
+        descriptors[valid] = vecs
+        return descriptors
+
+    @staticmethod
+    def _descriptor_histograms(
+        magnitude_img: np.ndarray,
+        angle_img: np.ndarray,
+        base_x: np.ndarray,
+        base_y: np.ndarray,
+        orientations: np.ndarray,
+        scale: float,
+        origins: np.ndarray,
+        gather_elements: int = _MAX_GATHER_ELEMENTS,
+    ) -> np.ndarray:
+        """Unnormalised 4x4x8 histograms for keypoints sharing one level and scale.
+
+        ``orientations`` are in degrees, as stored in :class:`KeypointArray`.
+        ``base_x``/``base_y`` are octave coordinates; ``origins`` holds, per
+        keypoint, the (row, col) where the gradient images start within the
+        octave (non-zero for tiles and budget patches).
+        """
+        window_size = int(round(8 * scale))
+        half_width = window_size // 2
+        offsets = np.arange(-half_width, half_width)
+        dy, dx = np.meshgrid(offsets, offsets, indexing="ij")
+        dy = dy.ravel()
+        dx = dx.ravel()
+        weights = np.exp(-((dx**2 + dy**2) / (2 * (0.5 * window_size) ** 2)))
+        cell_size = half_width / 2 + 1e-5
+        rows, cols = magnitude_img.shape
+
+        count = len(base_x)
+        hist = np.zeros((count, 128), dtype=np.float32)
+        if weights.size == 0:
+            return hist
+        chunk = max(1, gather_elements // weights.size)
+        for start in range(0, count, chunk):
+            stop = min(start + chunk, count)
+            radians = np.radians(orientations[start:stop, None])
+            cos_o = np.cos(radians)
+            sin_o = np.sin(radians)
+            rot_x = cos_o * dx - sin_o * dy
+            rot_y = sin_o * dx + cos_o * dy
+
+            # Clamped samples land on the zero-magnitude border (see
+            # _gradient_level) and therefore contribute nothing.
+            ix = np.rint(rot_x + base_x[start:stop, None]).astype(np.intp)
+            iy = np.rint(rot_y + base_y[start:stop, None]).astype(np.intp)
+            ix -= origins[start:stop, 1, None]
+            iy -= origins[start:stop, 0, None]
+            np.clip(ix, 0, cols - 1, out=ix)
+            np.clip(iy, 0, rows - 1, out=iy)
+            magnitude = magnitude_img[iy, ix] * weights
+            theta = (angle_img[iy, ix] - orientations[start:stop, None]) % 360
+            bins = np.rint(theta / 45).astype(np.intp) % 8
+
+            cell_x = np.floor((rot_x + half_width) / cell_size).astype(np.intp)
+            cell_y = np.floor((rot_y + half_width) / cell_size).astype(np.intp)
+            inside = (cell_x >= 0) & (cell_x < 4) & (cell_y >= 0) & (cell_y < 4)
+            flat = (cell_y * 4 + cell_x) * 8 + bins
+            flat += 128 * np.arange(stop - start)[:, None]
+            sums = np.bincount(
+                flat[inside],
+                weights=magnitude[inside],
+                minlength=(stop - start) * 128,
+            )
+            hist[start:stop] = sums.reshape(-1, 128)
+        return hist
 
-        if not descriptors:
-            return np.zeros((0, 128), dtype=np.float32)
-        return np.vstack(descriptors)
+    def _compute_binary_descriptors(
+        self,
+        keypoints: KeypointArray,
+        image: np.ndarray,
+        origin: Tuple[int, int] | np.ndarray = (0, 0),
+    ) -> np.ndarray:
+        """Steered BRIEF descriptors sampled from one blurred level, packed to bits.
+
+        ``image`` is the Gaussian level the keypoints were detected on (all
+        keypoints share its octave), so the comparisons see the same smoothing
+        as the gradients used for orientation.  Each bit is
+        ``I(p) < I(q)`` for one pair of :data:`_BINARY_PATTERN`, scaled to
+        the SIFT window and rotated by the keypoint orientation.  ``origin`` is
+        where ``image`` starts within the octave, or one (row, col) per keypoint.
+        """
+        bits = np.zeros((len(keypoints), _BINARY_BITS), dtype=bool)
+        if len(keypoints) == 0:
+            return np.packbits(bits, axis=1)
+        origins = np.broadcast_to(np.asarray(origin, dtype=np.intp), (len(keypoints), 2))
+        rows, cols = image.shape
+        octave = int(keypoints.octave[0])
+        base_x = keypoints.x.astype(np.float64) / (2**octave)
+        base_y = keypoints.y.astype(np.float64) / (2**octave)
+        radians = np.radians(keypoints.orientation.astype(np.float64))
+        cos_o = np.cos(radians)[:, None, None]
+        sin_o = np.sin(radians)[:, None, None]
+        # Same reach as the SIFT window: half of round(8 * scale).
+        reach = (np.rint(8 * keypoints.sigma.astype(np.float64)) // 2)[:, None, None]
+        px = _BINARY_PATTERN[None, :, :, 0] * reach
+        py = _BINARY_PATTERN[None, :, :, 1] * reach
+
+        chunk = max(1, self.gather_elements // (2 * _BINARY_BITS))
+        for start in range(0, len(keypoints), chunk):
+            stop = min(start + chunk, len(keypoints))
+            block = slice(start, stop)
+            rot_x = cos_o[block] * px[block] - sin_o[block] * py[block]
+            rot_y = sin_o[block] * px[block] + cos_o[block] * py[block]
+            ix = np.rint(rot_x + base_x[block, None, None]).astype(np.intp)
+            iy = np.rint(rot_y + base_y[block, None, None]).astype(np.intp)
+            ix -= origins[block, 1, None, None]
+            iy -= origins[block, 0, None, None]
+            np.clip(ix, 0, cols - 1, out=ix)
+            np.clip(iy, 0, rows - 1, out=iy)
+            samples = image[iy, ix]
+            bits[block] = samples[:, :, 0] < samples[:, :, 1]
+        return np.packbits(bits, axis=1)
+
+
+def quantize_descriptors(descriptors: np.ndarray) -> np.ndarray:
+    """Normalised SIFT descriptors as uint8, scaled by 512 and saturated like OpenCV's.
+
+    Clipping at 0.2 and renormalising keeps every component well below 0.5,
+    so the scale loses almost nothing while cutting storage to 128 bytes per
+    descriptor.
+    """
+    return np.clip(np.rint(np.asarray(descriptors) * 512), 0, 255).astype(np.uint8)
+
+
+# ---------------------------------------------------------------------------
+# Feature cache
+
+
+class FeatureCache:
+    """On-disk keypoint/descriptor cache with LRU eviction by total size.
+
+    Each entry is a directory named by :meth:`key` holding ``keypoints.npy``
+    (one record per keypoint) and ``descriptors.npy``, both loaded
+    memory-mapped.  An entry's mtime is its last use; the least recently used
+    entries are removed whenever the cache grows beyond ``max_bytes``.
+    """
+
+    def __init__(self, root: Path, max_bytes: int = 512 << 20) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(image_gray: np.ndarray, params: Dict[str, object]) -> str:
+        digest = hashlib.sha256()
+        image = np.ascontiguousarray(image_gray)
+        digest.update(f"{image.dtype.str}{image.shape}".encode())
+        digest.update(image.data)
+        digest.update(json.dumps(params, sort_keys=True).encode())
+        return digest.hexdigest()[:32]
+
+    def get(self, key: str) -> Tuple[KeypointArray, np.ndarray] | None:
+        entry = self.root / key
+        try:
+            records = np.load(entry / "keypoints.npy", mmap_mode="r")
+            descriptors = np.load(entry / "descriptors.npy", mmap_mode="r")
+            os.utime(entry)
+        except (OSError, ValueError):
+            # Missing, half-removed by another process's eviction, or corrupt.
+            return None
+        keypoints = KeypointArray(
+            **{field.name: records[field.name] for field in dataclasses.fields(KeypointArray)}
+        )
+        return keypoints, descriptors
+
+    def put(self, key: str, keypoints: KeypointArray, descriptors: np.ndarray) -> None:
+        fields = dataclasses.fields(KeypointArray)
+        records = np.empty(
+            len(keypoints),
+            dtype=[(field.name, getattr(keypoints, field.name).dtype) for field in fields],
+        )
+        for field in fields:
+            records[field.name] = getattr(keypoints, field.name)
+
+        # Write into a scratch directory and rename it into place so readers
+        # never see a half-written entry.
+        staging = self.root / f".{key}.{os.getpid()}.tmp"
+        staging.mkdir(parents=True, exist_ok=True)
+        np.save(staging / "keypoints.npy", records)
+        np.save(staging / "descriptors.npy", np.ascontiguousarray(descriptors))
+        try:
+            os.replace(staging, self.root / key)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+        self._evict(keep=key)
+
+    def get_or_compute(
+        self,
+        image_gray: np.ndarray,
+        params: Dict[str, object],
+        compute: Callable[[], Tuple[KeypointArray, np.ndarray]],
+    ) -> Tuple[KeypointArray, np.ndarray]:
+        key = self.key(image_gray, params)
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+        keypoints, descriptors = compute()
+        self.put(key, keypoints, descriptors)
+        return keypoints, descriptors
+
+    def _evict(self, keep: str) -> None:
+        entries = []
+        total = 0
+        for entry in self.root.iterdir():
+            if not entry.is_dir() or entry.name.startswith("."):
+                continue
+            try:
+                size = sum(path.stat().st_size for path in entry.iterdir())
+                entries.append((entry.stat().st_mtime, entry, size))
+            except FileNotFoundError:
+                # Evicted by another process sharing the cache directory.
+                continue
+            total += size
+        for _, entry, size in sorted(entries, key=lambda item: item[0]):
+            if total <= self.max_bytes:
+                break
+            if entry.name == keep:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
 
 
 # ---------------------------------------------------------------------------
 # Matching + RANSAC helpers
 
 
+class KDForestIndex:
+    """Randomised kd-forest for approximate nearest-neighbour descriptor search.
+
+    Every tree is a balanced binary tree of fixed depth: each node splits its
+    rows at the median of a dimension drawn at random from the ``top_dims``
+    highest-variance ones, down to leaves of ``leaf_size`` to twice that many
+    rows.  Queries descend all trees together with array operations; extra
+    leaves are probed by flipping the decisions with the smallest split
+    margins until roughly ``checks`` candidates per query have been visited.
+    Queries that reach the same leaf are scored against it with one matrix
+    product.
+    """
+
+    def __init__(
+        self,
+        data: np.ndarray,
+        num_trees: int = 4,
+        leaf_size: int = 16,
+        top_dims: int = 5,
+        seed: int = 0,
+    ) -> None:
+        self.data = np.ascontiguousarray(data, dtype=np.float32)
+        self.sq_norms = np.einsum("ij,ij->i", self.data, self.data)
+        top_dims = min(top_dims, self.data.shape[1])
+        # Leaves end up with between leaf_size and 2 * leaf_size rows.
+        ratio = len(self.data) / max(1, leaf_size)
+        self.depth = int(math.floor(math.log2(ratio))) if ratio >= 2 else 0
+        self.leaf_rows = len(self.data) / 2**self.depth
+        rng = np.random.default_rng(seed)
+        self.trees = [self._build_tree(rng, top_dims) for _ in range(max(1, num_trees))]
+
+    def _build_tree(
+        self, rng: np.random.Generator, top_dims: int
+    ) -> Tuple[np.ndarray, np.ndarray, List[np.ndarray]]:
+        # All nodes of one level are split together: rows are kept in ``perm``
+        # so that every node owns a contiguous range between ``bounds``.
+        num_rows = len(self.data)
+        split_dims = np.zeros(2**self.depth - 1, dtype=np.intp)
+        split_vals = np.zeros(2**self.depth - 1, dtype=np.float32)
+        perm = np.arange(num_rows)
+        bounds = np.array([0, num_rows])
+        for level in range(self.depth):
+            starts, sizes = bounds[:-1], np.diff(bounds)
+            num_nodes = len(sizes)
+            node_of_row = np.repeat(np.arange(num_nodes), sizes)
+
+            samples = max(2, min(int(sizes.min()), 100, 8192 // num_nodes))
+            offsets = rng.integers(0, sizes[:, None], size=(num_nodes, samples))
+            variance = self.data[perm[starts[:, None] + offsets]].var(axis=1)
+            top = np.argpartition(-variance, top_dims - 1, axis=1)[:, :top_dims]
+            dims = top[np.arange(num_nodes), rng.integers(0, top_dims, num_nodes)]
+
+            values = self.data[perm, dims[node_of_row]]
+            # Sort by (node, value) with one float64 key: the value is squashed
+            # into [0, 0.5) so rows never leave their node's range.
+            span = float(values.max() - values.min()) or 1.0
+            order = np.argsort(node_of_row + 0.5 * (values - values.min()) / span)
+            perm = perm[order]
+            values = values[order]
+            mids = starts + sizes // 2
+            nodes = 2**level - 1 + np.arange(num_nodes)
+            split_dims[nodes] = dims
+            split_vals[nodes] = (values[mids - 1] + values[mids]) / 2
+            bounds = np.sort(np.concatenate((bounds, mids)))
+        segments = [perm[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+        return split_dims, split_vals, segments
+
+    def _descend(
+        self,
+        tree: Tuple[np.ndarray, np.ndarray, List[np.ndarray]],
+        queries: np.ndarray,
+        node: np.ndarray,
+    ) -> np.ndarray:
+        split_dims, split_vals, _ = tree
+        first_leaf = 2**self.depth - 1
+        rows = np.arange(len(queries))
+        for _ in range(self.depth):
+            active = node < first_leaf
+            if not active.any():
+                break
+            cur = node[active]
+            right = queries[rows[active], split_dims[cur]] > split_vals[cur]
+            node[active] = 2 * cur + 1 + right
+        return node - first_leaf
+
+    def _probe_leaves(
+        self,
+        tree: Tuple[np.ndarray, np.ndarray, List[np.ndarray]],
+        queries: np.ndarray,
+        probes: int,
+    ) -> np.ndarray:
+        """(Q, probes) leaf ids: the query's own leaf, then multi-probe leaves."""
+        split_dims, split_vals, _ = tree
+        num_queries = len(queries)
+        rows = np.arange(num_queries)
+        node = np.zeros(num_queries, dtype=np.intp)
+        margins = np.empty((num_queries, self.depth), dtype=np.float32)
+        siblings = np.empty((num_queries, self.depth), dtype=np.intp)
+        for level in range(self.depth):
+            diff = queries[rows, split_dims[node]] - split_vals[node]
+            right = diff > 0
+            siblings[:, level] = 2 * node + 2 - right
+            margins[:, level] = np.abs(diff)
+            node = 2 * node + 1 + right
+        leaves = [node - (2**self.depth - 1)]
+        # Re-enter the tree at the siblings of the closest split planes.
+        closest = np.argsort(margins, axis=1)[:, : probes - 1]
+        for column in closest.T:
+            leaves.append(self._descend(tree, queries, siblings[rows, column]))
+        return np.column_stack(leaves)
+
+    def query(
+        self, queries: np.ndarray, k: int = 2, checks: int = 256
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximate ``k`` nearest neighbours of each query row.
+
+        Returns ``(indices, distances)`` of shape ``(Q, k)``; missing
+        neighbours are reported as index ``-1`` with infinite distance.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        num_queries = len(queries)
+        indices = np.full((num_queries, k), -1, dtype=np.intp)
+        distances = np.full((num_queries, k), np.inf, dtype=np.float32)
+        if num_queries == 0 or len(self.data) == 0:
+            return indices, distances
+
+        per_tree = max(1, checks // len(self.trees))
+        probes = min(max(1, round(per_tree / self.leaf_rows)), self.depth + 1)
+        visits = len(self.trees) * probes
+        # Best k per (query, visited leaf); merged across leaves afterwards.
+        cand_idx = np.full((num_queries, visits, k), -1, dtype=np.intp)
+        cand_d2 = np.full((num_queries, visits, k), np.inf, dtype=np.float32)
+
+        for tree_idx, tree in enumerate(self.trees):
+            segments = tree[2]
+            leaf_of = self._probe_leaves(tree, queries, probes).ravel()
+            order = np.argsort(leaf_of, kind="stable")
+            bounds = np.searchsorted(leaf_of[order], np.arange(len(segments) + 1))
+            for leaf, members in enumerate(segments):
+                visit = order[bounds[leaf] : bounds[leaf + 1]]
+                if visit.size == 0 or members.size == 0:
+                    continue
+                q_ids, probe = np.divmod(visit, probes)
+                d2 = queries[q_ids] @ (-2 * self.data[members]).T
+                d2 += self.sq_norms[members]
+                take = min(k, members.size)
+                if take < members.size:
+                    top = np.argpartition(d2, take - 1, axis=1)[:, :take]
+                else:
+                    top = np.broadcast_to(np.arange(members.size), d2.shape)
+                slot = tree_idx * probes + probe
+                cand_idx[q_ids, slot, :take] = members[top]
+                cand_d2[q_ids, slot, :take] = np.take_along_axis(d2, top, axis=1)
+
+        cand_idx = cand_idx.reshape(num_queries, -1)
+        cand_d2 = cand_d2.reshape(num_queries, -1)
+        # The same row can be reached through several trees; keep it once.
+        by_id = np.argsort(cand_idx, axis=1, kind="stable")
+        sorted_idx = np.take_along_axis(cand_idx, by_id, axis=1)
+        dup = np.zeros_like(sorted_idx, dtype=bool)
+        dup[:, 1:] = sorted_idx[:, 1:] == sorted_idx[:, :-1]
+        dup |= sorted_idx < 0
+        sorted_d2 = np.where(dup, np.inf, np.take_along_axis(cand_d2, by_id, axis=1))
+
+        take = min(k, sorted_idx.shape[1])
+        best = np.argsort(sorted_d2, axis=1, kind="stable")[:, :take]
+        best_idx = np.take_along_axis(sorted_idx, best, axis=1)
+        found = np.isfinite(np.take_along_axis(sorted_d2, best, axis=1))
+        best_idx[~found] = -1
+
+        # Re-score the survivors exactly; the expanded form above only ranks.
+        exact = np.linalg.norm(self.data[np.maximum(best_idx, 0)] - queries[:, None, :], axis=2)
+        exact[~found] = np.inf
+        resort = np.argsort(exact, axis=1, kind="stable")
+        indices[:, :take] = np.take_along_axis(best_idx, resort, axis=1)
+        distances[:, :take] = np.take_along_axis(exact, resort, axis=1)
+        return indices, distances
+
+
+def _merge_best_two(
+    best_d: np.ndarray, best_idx: np.ndarray, tile: np.ndarray, col_offset: int
+) -> None:
+    """Fold the two smallest entries of each ``tile`` row into ``best_d``/``best_idx``.
+
+    ``tile`` holds the distances of those rows to columns ``col_offset`` on and
+    is overwritten.  Ties keep the earlier candidate, as a full argsort would.
+    """
+    rows = np.arange(len(tile))
+    sentinel = np.inf if tile.dtype.kind == "f" else np.iinfo(tile.dtype).max
+    first = np.argmin(tile, axis=1)
+    first_d = tile[rows, first]
+    tile[rows, first] = sentinel
+    second = np.argmin(tile, axis=1)
+    second_d = tile[rows, second]
+
+    merged_d = np.column_stack((best_d, first_d, second_d))
+    merged_idx = np.column_stack((best_idx, first + col_offset, second + col_offset))
+    keep = np.argsort(merged_d, axis=1, kind="stable")[:, :2]
+    best_d[:] = np.take_along_axis(merged_d, keep, axis=1)
+    best_idx[:] = np.take_along_axis(merged_idx, keep, axis=1)
+
+
 def match_descriptors(
+    desc_a: np.ndarray,
+    desc_b: np.ndarray,
+    ratio: float,
+    cross_check: bool = False,
+    tile_bytes: int = _MATCH_TILE_BYTES,
+) -> MatchArray:
+    """Nearest-neighbour matching with Lowe's ratio test.
+
+    Squared L2 distances are evaluated tile by tile as
+    ``|a|^2 + |b|^2 - 2 a.b`` so that at most ``tile_bytes`` of distances are
+    alive at once, keeping the best two candidates per row of ``desc_a``.
+    With ``cross_check`` a match is only kept when the ``desc_a`` row is also
+    the nearest neighbour of its ``desc_b`` partner (computed from the same
+    tiles).
+    """
+    if len(desc_a) == 0 or len(desc_b) < 2:
+        return MatchArray.empty()
+    desc_a = np.asarray(desc_a, dtype=np.float32)
+    desc_b = np.asarray(desc_b, dtype=np.float32)
+    num_a, num_b = len(desc_a), len(desc_b)
+    sq_a = np.einsum("ij,ij->i", desc_a, desc_a)
+    sq_b = np.einsum("ij,ij->i", desc_b, desc_b)
+    scaled_b = -2 * desc_b
+
+    tile_cols = min(num_b, max(2, tile_bytes // 4))
+    tile_rows = max(1, tile_bytes // (4 * tile_cols))
+    # |a|^2 is constant along a row, so candidates are ranked on
+    # |b|^2 - 2 a.b and the row term is only added back for the cross-check.
+    best_d2 = np.full((num_a, 2), np.inf, dtype=np.float32)
+    best_idx = np.zeros((num_a, 2), dtype=np.intp)
+    col_best_d2 = np.full(num_b, np.inf, dtype=np.float32)
+
+    for r0 in range(0, num_a, tile_rows):
+        r1 = min(r0 + tile_rows, num_a)
+        for c0 in range(0, num_b, tile_cols):
+            c1 = min(c0 + tile_cols, num_b)
+            d2 = desc_a[r0:r1] @ scaled_b[c0:c1].T
+            d2 += sq_b[None, c0:c1]
+            if cross_check:
+                np.minimum(
+                    col_best_d2[c0:c1],
+                    (d2 + sq_a[r0:r1, None]).min(axis=0),
+                    out=col_best_d2[c0:c1],
+                )
+
+            _merge_best_two(best_d2[r0:r1], best_idx[r0:r1], d2, c0)
+
+    # The expanded form loses precision for near-identical descriptors, so the
+    # two surviving candidates are re-scored exactly before the ratio test.
+    exact = np.linalg.norm(desc_b[best_idx] - desc_a[:, None, :], axis=2)
+    swap = exact[:, 1] < exact[:, 0]
+    exact[swap] = exact[swap][:, ::-1]
+    best_idx[swap] = best_idx[swap][:, ::-1]
+    best_d2[swap] = best_d2[swap][:, ::-1]
+
+    accepted = exact[:, 0] < ratio * exact[:, 1]
+    if cross_check:
+        accepted &= best_d2[:, 0] + sq_a <= col_best_d2[best_idx[:, 0]]
+    rows = np.flatnonzero(accepted)
+    return MatchArray(rows, best_idx[rows, 0], exact[rows, 0])
+
+
+def match_descriptors_hamming(
+    desc_a: np.ndarray,
+    desc_b: np.ndarray,
+    ratio: float,
+    cross_check: bool = False,
+    tile_bytes: int = _MATCH_TILE_BYTES,
+) -> MatchArray:
+    """Ratio-test matching of packed binary descriptors by Hamming distance.
+
+    Bits are unpacked to +-1 float32 one tile at a time, so that
+    ``a.b = bits - 2 * hamming`` and a whole tile is a single BLAS product.
+    Every value is a small integer and exact in float32.  Candidates are
+    ranked on ``-a.b`` and converted back to integer distances at the end.
+    The unpacked tiles and the distances each stay within ``tile_bytes``.
+    ``cross_check`` has the same meaning as in :func:`match_descriptors`.
+    """
+    if len(desc_a) == 0 or len(desc_b) < 2:
+        return MatchArray.empty()
+    desc_a = np.asarray(desc_a, dtype=np.uint8)
+    desc_b = np.asarray(desc_b, dtype=np.uint8)
+    num_a, num_b = len(desc_a), len(desc_b)
+    bits = 8 * desc_a.shape[1]
+
+    tile_cols = min(num_b, max(2, tile_bytes // (4 * bits)))
+    tile_rows = max(1, tile_bytes // (4 * max(tile_cols, bits)))
+    best_d = np.full((num_a, 2), np.inf, dtype=np.float32)
+    best_idx = np.zeros((num_a, 2), dtype=np.intp)
+    col_best_d = np.full(num_b, np.inf, dtype=np.float32)
+
+    for r0 in range(0, num_a, tile_rows):
+        r1 = min(r0 + tile_rows, num_a)
+        signs_a = _hamming_signs(desc_a[r0:r1])
+        for c0 in range(0, num_b, tile_cols):
+            c1 = min(c0 + tile_cols, num_b)
+            d = signs_a @ -_hamming_signs(desc_b[c0:c1]).T
+            if cross_check:
+                np.minimum(col_best_d[c0:c1], d.min(axis=0), out=col_best_d[c0:c1])
+            _merge_best_two(best_d[r0:r1], best_idx[r0:r1], d, c0)
+
+    hamming = ((best_d + bits) / 2).astype(np.int32)
+    accepted = hamming[:, 0] < ratio * hamming[:, 1]
+    if cross_check:
+        accepted &= best_d[:, 0] <= col_best_d[best_idx[:, 0]]
+    rows = np.flatnonzero(accepted)
+    return MatchArray(rows, best_idx[rows, 0], hamming[rows, 0])
+
+
+def _hamming_signs(desc: np.ndarray) -> np.ndarray:
+    """Packed bits as float32 +1 (set) / -1 (clear), one row per descriptor."""
+    signs = np.unpackbits(desc, axis=1).astype(np.float32)
+    signs *= 2
+    signs -= 1
+    return signs
+
+
+def match_descriptors_quantized(
+    desc_a: np.ndarray,
+    desc_b: np.ndarray,
+    ratio: float,
+    cross_check: bool = False,
+    tile_bytes: int = _MATCH_TILE_BYTES,
+) -> MatchArray:
+    """:func:`match_descriptors` for uint8 descriptors from :func:`quantize_descriptors`.
+
+    Squared distances are exact integers.  Tiles are scored as
+    ``|b|^2 - 2 a.b`` through float32 BLAS: for 128 uint8 components every
+    product and partial sum stays below 2**24 in magnitude, so float32 holds
+    them exactly (a plain int32 matmul gives the same numbers an order of
+    magnitude slower) and no re-scoring pass is needed.  Descriptors stay
+    uint8 except for the tile being scored.
+    """
+    if len(desc_a) == 0 or len(desc_b) < 2:
+        return MatchArray.empty()
+    desc_a = np.asarray(desc_a, dtype=np.uint8)
+    desc_b = np.asarray(desc_b, dtype=np.uint8)
+    num_a, num_b = len(desc_a), len(desc_b)
+    sq_a = np.einsum("ij,ij->i", desc_a, desc_a, dtype=np.int32)
+    # Exact in float32 as well (at most 128 * 255**2).
+    sq_b = np.einsum("ij,ij->i", desc_b, desc_b, dtype=np.int32).astype(np.float32)
+
+    tile_cols = min(num_b, max(2, tile_bytes // 4))
+    tile_rows = max(1, tile_bytes // (4 * tile_cols))
+    # As in match_descriptors, rows are ranked without the constant |a|^2.
+    best_d2 = np.full((num_a, 2), np.inf, dtype=np.float32)
+    best_idx = np.zeros((num_a, 2), dtype=np.intp)
+    col_best_d2 = np.full(num_b, np.iinfo(np.int32).max, dtype=np.int32)
+
+    for r0 in range(0, num_a, tile_rows):
+        r1 = min(r0 + tile_rows, num_a)
+        block_a = desc_a[r0:r1].astype(np.float32)
+        for c0 in range(0, num_b, tile_cols):
+            c1 = min(c0 + tile_cols, num_b)
+            d2 = block_a @ (-2 * desc_b[c0:c1].astype(np.float32)).T
+            d2 += sq_b[None, c0:c1]
+            if cross_check:
+                np.minimum(
+                    col_best_d2[c0:c1],
+                    (d2 + sq_a[r0:r1, None]).min(axis=0).astype(np.int32),
+                    out=col_best_d2[c0:c1],
+                )
+            _merge_best_two(best_d2[r0:r1], best_idx[r0:r1], d2, c0)
+
+    # Back to exact integer squared distances; the ratio test compares them
+    # against the squared ratio so no square roots are needed.
+    best_sq = best_d2.astype(np.int32) + sq_a[:, None]
+    accepted = best_sq[:, 0] < (ratio * ratio) * best_sq[:, 1]
+    if cross_check:
+        accepted &= best_sq[:, 0] <= col_best_d2[best_idx[:, 0]]
+    rows = np.flatnonzero(accepted)
+    return MatchArray(rows, best_idx[rows, 0], np.sqrt(best_sq[rows, 0]))
+
+
+def match_descriptors_ann(
+    desc_a: np.ndarray, index: KDForestIndex, ratio: float, checks: int = 256
+) -> MatchArray:
+    """Ratio-test matching of ``desc_a`` against a prebuilt :class:`KDForestIndex`."""
+    if len(desc_a) == 0 or len(index.data) < 2:
+        return MatchArray.empty()
+    indices, distances = index.query(desc_a, k=2, checks=checks)
+    accepted = (indices[:, 0] >= 0) & (distances[:, 0] < ratio * distances[:, 1])
+    rows = np.flatnonzero(accepted)
+    return MatchArray(rows, indices[rows, 0], distances[rows, 0])
+
+
+def match_descriptors_opencv(
     desc_a: np.ndarray, desc_b: np.ndarray, ratio: float
-) -> List[Match]:
-    matches: List[Match] = []
-    if desc_a.size == 0 or desc_b.size == 0:
-        return matches
-    for idx_a, vector in enumerate(desc_a):
-        distances = np.linalg.norm(desc_b - vector, axis=1)
-        if len(distances) < 2:
-            continue
-        best_idx = np.argmin(distances)
-        best = distances[best_idx]
-        distances[best_idx] = np.inf
-        second = np.min(distances)
-        if best < ratio * second:
-            matches.append(Match(idx_a=idx_a, idx_b=int(best_idx), distance=float(best)))
-    return matches
+) -> List[cv2.DMatch]:
+    """Brute-force L2 matching with Lowe's ratio test, as in the OpenCV baseline."""
+    if len(desc_a) == 0 or len(desc_b) < 2:
+        return []
+    bf = cv2.BFMatcher(cv2.NORM_L2, crossCheck=False)
+    return [
+        pair[0]
+        for pair in bf.knnMatch(desc_a, desc_b, k=2)
+        if len(pair) == 2 and pair[0].distance < ratio * pair[1].distance
+    ]
+
+
+def match_recall(approx: MatchArray, exact: MatchArray) -> float:
+    """Fraction of ``exact`` correspondences that ``approx`` also found."""
+    if len(exact) == 0:
+        return 1.0
+    width = int(max(exact.idx_b.max(initial=0), approx.idx_b.max(initial=0))) + 1
+    found = np.isin(exact.idx_a * width + exact.idx_b, approx.idx_a * width + approx.idx_b)
+    return float(found.mean())
+
+
+def gms_filter(
+    pts_a: np.ndarray | KeypointArray,
+    pts_b: np.ndarray | KeypointArray,
+    matches: MatchArray | List[cv2.DMatch],
+    shape_a: Tuple[int, int],
+    shape_b: Tuple[int, int],
+    grid: int = 20,
+    alpha: float = 6.0,
+) -> np.ndarray:
+    """Grid-based motion statistics (Bian et al., 2017): mask of well-supported matches.
+
+    Both images (``shape_*`` is ``(rows, cols)``) are divided into
+    ``grid`` x ``grid`` cells and the matches are counted per (cell of A,
+    cell of B) pair.  Each cell of A is paired with the B cell receiving most
+    of its matches.  The pair's score is the number of matches between the
+    corresponding 3x3 neighbourhoods.  Its matches are kept when the score
+    exceeds ``alpha * sqrt(mean matches per neighbouring cell)``.  As in GMS,
+    this is repeated on grids shifted by half a cell in x, y and both, and a
+    match kept by any of them survives.
+
+    Only the cell pairs that occur are counted (sorted, with
+    :func:`numpy.unique`), so memory grows with the number of matches rather
+    than with ``grid ** 4``.
+    """
+    if not isinstance(matches, MatchArray):
+        matches = MatchArray.from_cv_matches(matches)
+    keep = np.zeros(len(matches), dtype=bool)
+    if len(matches) == 0:
+        return keep
+    src = keypoints_to_array(pts_a)[matches.idx_a].astype(np.float64)
+    dst = keypoints_to_array(pts_b)[matches.idx_b].astype(np.float64)
+    # A half-cell shift adds one row and column of cells.
+    cells = grid + 1
+
+    for shift in ((0.0, 0.0), (0.5, 0.0), (0.0, 0.5), (0.5, 0.5)):
+        ids = []
+        for points, (rows, cols) in ((src, shape_a), (dst, shape_b)):
+            xy = np.floor(points / (np.array([cols, rows]) / grid) + shift).astype(np.int64)
+            np.clip(xy, 0, cells - 1, out=xy)
+            ids.append(xy[:, 1] * cells + xy[:, 0])
+        id_a, id_b = ids
+        pairs, counts = np.unique(id_a * cells**2 + id_b, return_counts=True)
+        pair_a, pair_b = np.divmod(pairs, cells**2)
+        per_cell_a = np.bincount(id_a, minlength=cells * cells).reshape(cells, cells)
+
+        # Best B cell of every occupied A cell: most matches, lowest id on ties.
+        order = np.lexsort((-counts, pair_a))
+        first = np.r_[True, pair_a[order][1:] != pair_a[order][:-1]]
+        cell_a = pair_a[order][first]
+        best_b = pair_b[order][first]
+        cell_ay, cell_ax = np.divmod(cell_a, cells)
+        cell_by, cell_bx = np.divmod(best_b, cells)
+        score = np.zeros(len(cell_a), dtype=np.int64)
+        support = np.zeros(len(cell_a), dtype=np.int64)
+        neighbours = np.zeros(len(cell_a), dtype=np.int64)
+        for dy, dx in itertools.product((-1, 0, 1), repeat=2):
+            ay, ax = cell_ay + dy, cell_ax + dx
+            by, bx = cell_by + dy, cell_bx + dx
+            inside = (
+                (ay >= 0) & (ay < cells) & (ax >= 0) & (ax < cells)
+                & (by >= 0) & (by < cells) & (bx >= 0) & (bx < cells)
+            )
+            wanted = ((ay * cells + ax) * cells + by) * cells + bx
+            found = np.minimum(np.searchsorted(pairs, wanted), len(pairs) - 1)
+            hits = inside & (pairs[found] == wanted)
+            score[hits] += counts[found[hits]]
+            support[inside] += per_cell_a[ay[inside], ax[inside]]
+            neighbours[inside] += 1
+        threshold = alpha * np.sqrt(support / np.maximum(neighbours, 1))
+        accepted = score > threshold
+        slot = np.searchsorted(cell_a, id_a)
+        keep |= accepted[slot] & (best_b[slot] == id_b)
+    return keep
+
+
+def _normalization_transforms(points: np.ndarray) -> np.ndarray:
+    """Hartley normalisation: (B, 3, 3) similarities that move each point set's
+    centroid to the origin and its mean distance from it to sqrt(2)."""
+    centroid = points.mean(axis=1)
+    mean_dist = np.linalg.norm(points - centroid[:, None, :], axis=2).mean(axis=1)
+    scale = np.sqrt(2) / np.maximum(mean_dist, 1e-12)
+    T = np.zeros((len(points), 3, 3))
+    T[:, 0, 0] = scale
+    T[:, 1, 1] = scale
+    T[:, :2, 2] = -scale[:, None] * centroid
+    T[:, 2, 2] = 1.0
+    return T
+
+
+def _has_collinear_triplet(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """True for (B, 4, 2) samples in which any three points are (nearly) collinear."""
+    flags = np.zeros(len(points), dtype=bool)
+    for i, j, k in itertools.combinations(range(points.shape[1]), 3):
+        edge_1 = points[:, j] - points[:, i]
+        edge_2 = points[:, k] - points[:, i]
+        area = np.abs(edge_1[:, 0] * edge_2[:, 1] - edge_1[:, 1] * edge_2[:, 0])
+        flags |= area < tolerance
+    return flags
+
+
+def compute_homographies(
+    src: np.ndarray, dst: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Normalised DLT for a batch of correspondence sets.
+
+    ``src``/``dst`` are (B, N, 2) with N >= 4.  All B linear systems are built
+    with array operations in Hartley-normalised coordinates and solved with a
+    single batched SVD.  Returns the (B, 3, 3) homographies (scaled so that
+    ``H[2, 2] == 1``) and a (B,) validity mask; minimal samples with three
+    collinear points in either image are rejected without being trusted.
+    """
+    src = np.asarray(src, dtype=np.float64)
+    dst = np.asarray(dst, dtype=np.float64)
+    batch, count = src.shape[:2]
+    T_src = _normalization_transforms(src)
+    T_dst = _normalization_transforms(dst)
+    src_n = src * T_src[:, None, 0, 0, None] + T_src[:, None, :2, 2]
+    dst_n = dst * T_dst[:, None, 0, 0, None] + T_dst[:, None, :2, 2]
+
+    valid = np.ones(batch, dtype=bool)
+    if count == 4:
+        # Normalised coordinates are O(1), so a fixed area tolerance works.
+        valid &= ~_has_collinear_triplet(src_n, 1e-3)
+        valid &= ~_has_collinear_triplet(dst_n, 1e-3)
+
+    x, y = src_n[..., 0], src_n[..., 1]
+    u, v = dst_n[..., 0], dst_n[..., 1]
+    zeros = np.zeros_like(x)
+    ones = np.ones_like(x)
+    rows_u = np.stack([-x, -y, -ones, zeros, zeros, zeros, u * x, u * y, u], axis=-1)
+    rows_v = np.stack([zeros, zeros, zeros, -x, -y, -ones, v * x, v * y, v], axis=-1)
+    A = np.stack([rows_u, rows_v], axis=2).reshape(batch, 2 * count, 9)
+    # Over-determined systems only need the 9x9 right singular vectors.
+    _, _, vt = np.linalg.svd(A, full_matrices=2 * count < 9)
+    H_n = vt[:, -1, :].reshape(batch, 3, 3)
+
+    H = np.linalg.inv(T_dst) @ H_n @ T_src
+    with np.errstate(divide="ignore", invalid="ignore"):
+        H = H / H[:, 2:, 2:]
+    valid &= np.isfinite(H).all(axis=(1, 2))
+    return H, valid
 
 
 def compute_homography(pairs: List[Tuple[np.ndarray, np.ndarray]]) -> np.ndarray:
-    A = []
-    for src, dst in pairs:
-        x, y = src
-        u, v = dst
-        A.append([-x, -y, -1, 0, 0, 0, u * x, u * y, u])
-        A.append([0, 0, 0, -x, -y, -1, v * x, v * y, v])
-    A = np.array(A, dtype=np.float64)
-    _, _, vt = np.linalg.svd(A)
-    h = vt[-1, :]
-    H = h.reshape(3, 3)
-    return H / H[2, 2]
+    src = np.array([pair[0] for pair in pairs], dtype=np.float64)
+    dst = np.array([pair[1] for pair in pairs], dtype=np.float64)
+    H, _ = compute_homographies(src[None], dst[None])
+    return H[0]
+
+
+def compute_translations(
+    src: np.ndarray, dst: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Least-squares translations for (B, N, 2) correspondence sets (N >= 1).
+
+    Returns (B, 3, 3) matrices and a validity mask, like
+    :func:`compute_homographies`.
+    """
+    src = np.asarray(src, dtype=np.float64)
+    dst = np.asarray(dst, dtype=np.float64)
+    T = np.tile(np.eye(3), (len(src), 1, 1))
+    T[:, :2, 2] = (dst - src).mean(axis=1)
+    return T, np.ones(len(src), dtype=bool)
+
+
+def compute_similarities(
+    src: np.ndarray, dst: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Least-squares similarities (rotation, uniform scale, translation), N >= 2.
+
+    With points written as complex numbers the model is ``d = a s + t``, so
+    the centred least-squares solution is
+    ``a = sum(conj(s) d) / sum(|s|^2)``.  Sets whose source points coincide
+    are invalid.
+    """
+    src = np.asarray(src, dtype=np.float64)
+    dst = np.asarray(dst, dtype=np.float64)
+    src_mean = src.mean(axis=1)
+    dst_mean = dst.mean(axis=1)
+    zs = (src[..., 0] - src_mean[:, None, 0]) + 1j * (src[..., 1] - src_mean[:, None, 1])
+    zd = (dst[..., 0] - dst_mean[:, None, 0]) + 1j * (dst[..., 1] - dst_mean[:, None, 1])
+    spread = (zs.real**2 + zs.imag**2).sum(axis=1)
+    valid = spread > 1e-6
+    with np.errstate(divide="ignore", invalid="ignore"):
+        a = (np.conj(zs) * zd).sum(axis=1) / spread
+    S = np.tile(np.eye(3), (len(src), 1, 1))
+    S[:, 0, 0] = a.real
+    S[:, 0, 1] = -a.imag
+    S[:, 1, 0] = a.imag
+    S[:, 1, 1] = a.real
+    S[:, :2, 2] = dst_mean - (S[:, :2, :2] @ src_mean[..., None])[..., 0]
+    valid &= np.isfinite(S).all(axis=(1, 2))
+    return S, valid
+
+
+def compute_affines(
+    src: np.ndarray, dst: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Least-squares affine transforms for (B, N, 2) correspondence sets, N >= 3.
+
+    Solved in centred coordinates from the 2x2 normal equations.  Sets whose
+    points are (nearly) collinear in either image are invalid.
+    """
+    src = np.asarray(src, dtype=np.float64)
+    dst = np.asarray(dst, dtype=np.float64)
+    src_mean = src.mean(axis=1)
+    dst_mean = dst.mean(axis=1)
+    src_c = src - src_mean[:, None]
+    dst_c = dst - dst_mean[:, None]
+    valid = np.ones(len(src), dtype=bool)
+    for points in (src_c, dst_c):
+        scatter = np.swapaxes(points, 1, 2) @ points
+        det = scatter[:, 0, 0] * scatter[:, 1, 1] - scatter[:, 0, 1] * scatter[:, 1, 0]
+        # Scale-free test: det / trace^2 is 1/4 for an isotropic spread and
+        # 0 for collinear points.
+        valid &= det > 1e-6 * (scatter[:, 0, 0] + scatter[:, 1, 1]) ** 2
+    A = np.tile(np.eye(3), (len(src), 1, 1))
+    if valid.any():
+        scatter = np.swapaxes(src_c[valid], 1, 2) @ src_c[valid]
+        cross = np.swapaxes(src_c[valid], 1, 2) @ dst_c[valid]
+        A[valid, :2, :2] = np.swapaxes(np.linalg.solve(scatter, cross), 1, 2)
+    A[:, :2, 2] = dst_mean - (A[:, :2, :2] @ src_mean[..., None])[..., 0]
+    return A, valid
+
+
+def _projection_error_sq(
+    hypotheses: np.ndarray, src_h: np.ndarray, dst: np.ndarray
+) -> np.ndarray:
+    """(B, N) squared transfer errors of every match under every homography."""
+    batch = len(hypotheses)
+    # One (3B, 3) x (3, N) product projects all matches under all hypotheses.
+    projected = (hypotheses.reshape(batch * 3, 3) @ src_h.T).reshape(batch, 3, -1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inv_w = 1.0 / projected[:, 2]
+        err_x = projected[:, 0] * inv_w - dst[:, 0]
+        err_y = projected[:, 1] * inv_w - dst[:, 1]
+    return err_x * err_x + err_y * err_y
+
+
+def _affine_error_sq(
+    transforms: np.ndarray, src_h: np.ndarray, dst: np.ndarray
+) -> np.ndarray:
+    """:func:`_projection_error_sq` for transforms whose last row is (0, 0, 1)."""
+    batch = len(transforms)
+    projected = (transforms[:, :2].reshape(batch * 2, 3) @ src_h.T).reshape(batch, 2, -1)
+    err_x = projected[:, 0] - dst[:, 0]
+    err_y = projected[:, 1] - dst[:, 1]
+    return err_x * err_x + err_y * err_y
+
+
+class _MotionModel(NamedTuple):
+    """Minimal sample size, batched solver and batched residual of one model."""
+
+    sample_size: int
+    fit: Callable[[np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]]
+    error_sq: Callable[[np.ndarray, np.ndarray, np.ndarray], np.ndarray]
+
+
+# Ordered from the simplest model to the most general one.
+MOTION_MODELS: Dict[str, _MotionModel] = {
+    "translation": _MotionModel(1, compute_translations, _affine_error_sq),
+    "similarity": _MotionModel(2, compute_similarities, _affine_error_sq),
+    "affine": _MotionModel(3, compute_affines, _affine_error_sq),
+    "homography": _MotionModel(4, compute_homographies, _projection_error_sq),
+}
+
+
+def _uniform_samples(
+    rng: random.Random, num_matches: int, size: int = 4
+) -> Iterator[List[int]]:
+    match_indices = list(range(num_matches))
+    while True:
+        yield rng.sample(match_indices, size)
+
+
+def _prosac_samples(
+    rng: random.Random, quality_order: np.ndarray, max_iterations: int, size: int = 4
+) -> Iterator[List[int]]:
+    """PROSAC (Chum & Matas, 2005): grow the sampling pool from the best matches.
+
+    ``quality_order`` lists match indices from best to worst.  Each sample of
+    ``size`` contains the newest member of the current top-``n`` pool plus
+    earlier ones, and ``n`` grows on the standard schedule so that after
+    ``max_iterations`` draws the sampler degenerates to uniform RANSAC.
+    """
+    order = quality_order.tolist()
+    total = len(order)
+    pool = size
+    t_n = float(max_iterations)
+    for i in range(size):
+        t_n *= (pool - i) / (total - i)
+    t_n_prime = 1
+    iteration = 0
+    while True:
+        iteration += 1
+        if iteration == t_n_prime and pool < total:
+            pool += 1
+            t_next = t_n * pool / (pool - size)
+            t_n_prime += math.ceil(t_next - t_n)
+            t_n = t_next
+        if t_n_prime < iteration or pool == size:
+            picks = rng.sample(range(pool), size)
+        else:
+            picks = rng.sample(range(pool - 1), size - 1) + [pool - 1]
+        yield [order[idx] for idx in picks]
+
+
+def _required_iterations(
+    inlier_counts: np.ndarray,
+    num_matches: int | np.ndarray,
+    confidence: float,
+    sample_size: int = 4,
+) -> np.ndarray:
+    """Iterations needed to draw one all-inlier sample with ``confidence``."""
+    if confidence >= 1.0:
+        return np.full(np.shape(inlier_counts), np.inf)
+    w_n = (inlier_counts / num_matches) ** sample_size
+    with np.errstate(divide="ignore", invalid="ignore"):
+        needed = np.ceil(math.log(1.0 - confidence) / np.log1p(-w_n))
+    needed[w_n >= 1.0] = 0
+    needed[w_n <= 0.0] = np.inf
+    return needed
 
 
 def ransac_homography(
-    pts_a: np.ndarray,
-    pts_b: np.ndarray,
-    matches: List[Match] | List[cv2.DMatch],
+    pts_a: np.ndarray | KeypointArray,
+    pts_b: np.ndarray | KeypointArray,
+    matches: MatchArray | List[cv2.DMatch],
     iterations: int,
     threshold: float,
+    seed: int = 42,
+    confidence: float = 0.995,
+    sampler: str = "uniform",
+    stats: Dict[str, float] | None = None,
 ) -> Tuple[np.ndarray | None, List[int]]:
-    if len(matches) < 4:
+    """Robust homography from putative matches (see :func:`ransac_transform`)."""
+    return ransac_transform(
+        pts_a,
+        pts_b,
+        matches,
+        iterations,
+        threshold,
+        model="homography",
+        seed=seed,
+        confidence=confidence,
+        sampler=sampler,
+        stats=stats,
+    )
+
+
+def ransac_transform(
+    pts_a: np.ndarray | KeypointArray,
+    pts_b: np.ndarray | KeypointArray,
+    matches: MatchArray | List[cv2.DMatch],
+    iterations: int,
+    threshold: float,
+    model: str = "homography",
+    seed: int = 42,
+    confidence: float = 0.995,
+    sampler: str = "uniform",
+    stats: Dict[str, float] | None = None,
+    auto_support: float = 0.95,
+) -> Tuple[np.ndarray | None, List[int]]:
+    """Robust 3x3 transform of one of the :data:`MOTION_MODELS` from putative matches.
+
+    Simpler models need smaller minimal samples (1, 2, 3 and 4 matches for
+    translation, similarity, affine and homography), so far fewer hypotheses
+    reach the same confidence.  ``model="auto"`` returns the simplest model
+    whose inlier count is at least ``auto_support`` times that of the most
+    general model with any support, normally the homography (see
+    :func:`_ransac_auto`); ``stats["model"]`` names the choice and
+    ``stats["iterations"]`` sums all runs.
+
+    ``iterations`` is an upper bound: the loop stops as soon as the best
+    inlier ratio so far implies ``confidence`` of having drawn an outlier-free
+    sample (``confidence=1`` always runs every iteration).  ``sampler`` is
+    ``"uniform"`` or ``"prosac"``; the latter draws from the lowest-distance
+    matches first and also accepts the inlier ratio within any top-``n``
+    prefix (``n >= 50``) of that ordering, as PROSAC's termination does.  If
+    given, ``stats["iterations"]`` receives the number of hypotheses actually
+    evaluated.  The winning model is refitted to its inliers by least squares.
+    """
+    if model == "auto":
+        return _ransac_auto(
+            pts_a,
+            pts_b,
+            matches,
+            iterations,
+            threshold,
+            seed,
+            confidence,
+            sampler,
+            stats,
+            auto_support,
+        )
+    if model not in MOTION_MODELS:
+        raise ValueError(f"Unknown motion model: {model}")
+    motion = MOTION_MODELS[model]
+    if stats is not None:
+        stats["iterations"] = 0
+        stats["model"] = model
+    if len(matches) < motion.sample_size:
         return None, []
-    best_inliers: List[int] = []
+    if not isinstance(matches, MatchArray):
+        matches = MatchArray.from_cv_matches(matches)
+    src = keypoints_to_array(pts_a)[matches.idx_a].astype(np.float64)
+    dst = keypoints_to_array(pts_b)[matches.idx_b].astype(np.float64)
+    src_h = np.column_stack((src, np.ones(len(src))))
+    threshold_sq = threshold * threshold
+
+    rng = random.Random(seed)
+    quality_order: np.ndarray | None = None
+    if sampler == "prosac":
+        quality_order = np.argsort(matches.distance, kind="stable")
+        samples = _prosac_samples(rng, quality_order, iterations, motion.sample_size)
+        min_prefix = min(len(src), 50)
+        prefix_sizes = np.arange(min_prefix, len(src) + 1)
+    elif sampler == "uniform":
+        samples = _uniform_samples(rng, len(matches), motion.sample_size)
+    else:
+        raise ValueError(f"Unknown RANSAC sampler: {sampler}")
+
+    best_needed = np.inf
+    best_count = 0
+    best_mask: np.ndarray | None = None
     best_H: np.ndarray | None = None
-    rng = random.Random(42)
-    match_indices = list(range(len(matches)))
-
-    for _ in range(iterations):
-        sample_ids = rng.sample(match_indices, 4)
-        pair_samples = []
-        for idx in sample_ids:
-            match = matches[idx]
-            ia = match.queryIdx if hasattr(match, "queryIdx") else match.idx_a
-            ib = match.trainIdx if hasattr(match, "trainIdx") else match.idx_b
-            pair_samples.append((pts_a[ia], pts_b[ib]))
-        H = compute_homography(pair_samples)
-
-        inliers: List[int] = []
-        for idx, match in enumerate(matches):
-            ia = match.queryIdx if hasattr(match, "queryIdx") else match.idx_a
-            ib = match.trainIdx if hasattr(match, "trainIdx") else match.idx_b
-            pt_a = np.append(pts_a[ia], 1.0)
-            projected = H @ pt_a
-            projected /= projected[2]
-            error = np.linalg.norm(projected[:2] - pts_b[ib])
-            if error < threshold:
-                inliers.append(idx)
-
-        if len(inliers) > len(best_inliers):
-            best_inliers = inliers
-            best_H = H
-
-    return best_H, best_inliers
+    # Batches start small and grow so an early stop wastes little work.
+    max_batch = max(1, min(256, _MAX_GATHER_ELEMENTS // (3 * len(src))))
+    batch = min(16, max_batch)
+    done = 0
+    while done < iterations:
+        sample_ids = np.array(list(itertools.islice(samples, min(batch, iterations - done))))
+        hypotheses, valid = motion.fit(src[sample_ids], dst[sample_ids])
+        inlier_mask = motion.error_sq(hypotheses, src_h, dst) < threshold_sq
+        inlier_mask[~valid] = False
+        counts = inlier_mask.sum(axis=1)
+
+        if quality_order is None:
+            needed = _required_iterations(counts, len(src), confidence, motion.sample_size)
+        else:
+            support = np.cumsum(inlier_mask[:, quality_order], axis=1)[:, min_prefix - 1 :]
+            needed = _required_iterations(
+                support, prefix_sizes, confidence, motion.sample_size
+            ).min(axis=1)
+        # Replay the adaptive stopping rule hypothesis by hypothesis so the
+        # result does not depend on the batch size.
+        needed = np.minimum.accumulate(np.minimum(needed, best_needed))
+        best_needed = needed[-1]
+        finished = done + np.arange(1, len(counts) + 1) >= needed
+        used = int(np.argmax(finished)) + 1 if finished.any() else len(counts)
+
+        top = int(np.argmax(counts[:used]))
+        if counts[top] > best_count:
+            best_count = int(counts[top])
+            best_mask = inlier_mask[top]
+            best_H = hypotheses[top]
+        done += used
+        if used < len(counts) or finished[used - 1]:
+            break
+        batch = min(2 * batch, max_batch)
+
+    if stats is not None:
+        stats["iterations"] = done
+    if best_mask is None:
+        return None, []
+
+    # Least-squares refit on the consensus set; an early stop (especially
+    # PROSAC's, which only needs a well-supported top-ranked prefix) usually
+    # ends on a minimal-sample model that a fit to all its inliers improves.
+    for _ in range(3):
+        refits, refit_ok = motion.fit(src[best_mask][None], dst[best_mask][None])
+        if not refit_ok[0]:
+            break
+        refit = refits[0]
+        refit_mask = motion.error_sq(refits, src_h, dst)[0] < threshold_sq
+        if refit_mask.sum() < best_count or np.array_equal(refit_mask, best_mask):
+            if refit_mask.sum() >= best_count:
+                best_H = refit
+            break
+        best_count = int(refit_mask.sum())
+        best_mask = refit_mask
+        best_H = refit
+    return best_H, np.flatnonzero(best_mask).tolist()
+
+
+def _ransac_auto(
+    pts_a: np.ndarray | KeypointArray,
+    pts_b: np.ndarray | KeypointArray,
+    matches: MatchArray | List[cv2.DMatch],
+    iterations: int,
+    threshold: float,
+    seed: int,
+    confidence: float,
+    sampler: str,
+    stats: Dict[str, float] | None,
+    auto_support: float,
+) -> Tuple[np.ndarray | None, List[int]]:
+    """``ransac_transform(model="auto")``: the simplest model with enough support.
+
+    The most general model is fitted first and sets the support target.  If
+    it finds no support (e.g. fewer than four matches), the next simpler model
+    takes its place.  A simpler model that reaches the target would have an
+    inlier ratio of at least ``target / len(matches)``, so each one is only
+    given the iterations that ratio requires; wrong models therefore stop
+    early instead of running to ``iterations``.
+    """
+    names = list(MOTION_MODELS)
+
+    def fit(name: str, max_iterations: int) -> Tuple[np.ndarray | None, List[int], int]:
+        run_stats: Dict[str, float] = {}
+        transform, inliers = ransac_transform(
+            pts_a,
+            pts_b,
+            matches,
+            max_iterations,
+            threshold,
+            model=name,
+            seed=seed,
+            confidence=confidence,
+            sampler=sampler,
+            stats=run_stats,
+        )
+        return transform, inliers, run_stats["iterations"]
+
+    chosen = names[-1]
+    total_iterations = 0
+    for reference in range(len(names) - 1, -1, -1):
+        transform, inliers, used = fit(names[reference], iterations)
+        total_iterations += used
+        if inliers:
+            chosen = names[reference]
+            break
+    target = auto_support * len(inliers)
+    if inliers:
+        for name in names[:reference]:
+            needed = _required_iterations(
+                np.array([target]), len(matches), confidence, MOTION_MODELS[name].sample_size
+            )[0]
+            simple, simple_inliers, used = fit(name, int(min(iterations, needed)))
+            total_iterations += used
+            if len(simple_inliers) >= target:
+                chosen, transform, inliers = name, simple, simple_inliers
+                break
+    if stats is not None:
+        stats["iterations"] = total_iterations
+        stats["model"] = chosen
+    return transform, inliers
+
+
+def match_descriptors_guided(
+    pts_a: np.ndarray | KeypointArray,
+    desc_a: np.ndarray,
+    pts_b: np.ndarray | KeypointArray,
+    desc_b: np.ndarray,
+    H: np.ndarray | None,
+    radius: float,
+    ratio: float,
+    metric: str = "l2",
+    stats: Dict[str, float] | None = None,
+) -> MatchArray:
+    """Second matching pass restricted to where ``H`` maps each keypoint of A.
+
+    Keypoints of B are bucketed into a uniform grid of ``radius``-sized
+    cells.  Each A keypoint is projected with ``H`` and compared only with the
+    B keypoints of the 3x3 cells around it that lie within ``radius`` pixels.
+    The nearest of those is kept if it passes the ratio test against the
+    second nearest (a lone candidate always passes).  ``metric`` is ``"l2"``,
+    or ``"hamming"`` for packed binary descriptors.  ``radius`` must be
+    positive.  If given, ``stats["comparisons"]`` receives the number of
+    descriptor distances evaluated.
+    """
+    if stats is not None:
+        stats["comparisons"] = 0
+    if not radius > 0:
+        raise ValueError(f"Guided matching radius must be positive, got {radius}")
+    if H is None or len(desc_a) == 0 or len(desc_b) == 0:
+        return MatchArray.empty()
+    if metric not in ("l2", "hamming"):
+        raise ValueError(f"Unknown descriptor metric: {metric}")
+    src = keypoints_to_array(pts_a).astype(np.float64)
+    dst = keypoints_to_array(pts_b).astype(np.float64)
+    projected = np.column_stack((src, np.ones(len(src)))) @ np.asarray(H, dtype=np.float64).T
+    with np.errstate(divide="ignore", invalid="ignore"):
+        projected = projected[:, :2] / projected[:, 2:3]
+    queries = np.flatnonzero(np.isfinite(projected).all(axis=1))
+
+    # Cells of side ``radius`` so every B point within ``radius`` of a
+    # projection lies in the 3x3 block of cells around it.  Only occupied
+    # columns, rows and cells are indexed, so the index grows with B rather
+    # than with its bounding box over ``radius`` squared.
+    origin = dst.min(axis=0)
+    cells_b = np.floor((dst - origin) / radius).astype(np.int64)
+    cols, col_b = np.unique(cells_b[:, 0], return_inverse=True)
+    rows, row_b = np.unique(cells_b[:, 1], return_inverse=True)
+    cell_ids_b = row_b * len(cols) + col_b
+    order_b = np.argsort(cell_ids_b, kind="stable")
+    occupied, cell_start = np.unique(cell_ids_b[order_b], return_index=True)
+    cell_stop = np.r_[cell_start[1:], len(order_b)]
+
+    # Clamp far-away projections so the cell arithmetic cannot overflow.
+    cells_q = np.floor(
+        np.clip((projected[queries] - origin) / radius, -2, [cols[-1] + 2, rows[-1] + 2])
+    ).astype(np.int64)
+
+    def neighbours(values: np.ndarray, cells: np.ndarray) -> List[np.ndarray]:
+        """Index into ``values`` of ``cells - 1``, ``cells`` and ``cells + 1`` (-1 if absent)."""
+        result = []
+        for offset in (-1, 0, 1):
+            found = np.minimum(np.searchsorted(values, cells + offset), len(values) - 1)
+            result.append(np.where(values[found] == cells + offset, found, -1))
+        return result
+
+    pair_a: List[np.ndarray] = []
+    pair_b: List[np.ndarray] = []
+    for row, col in itertools.product(
+        neighbours(rows, cells_q[:, 1]), neighbours(cols, cells_q[:, 0])
+    ):
+        cell_ids = row * len(cols) + col
+        slot = np.minimum(np.searchsorted(occupied, cell_ids), len(occupied) - 1)
+        inside = (row >= 0) & (col >= 0) & (occupied[slot] == cell_ids)
+        starts = cell_start[slot[inside]]
+        counts = cell_stop[slot[inside]] - starts
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        pair_a.append(np.repeat(queries[inside], counts))
+        pair_b.append(order_b[np.repeat(starts, counts) + offsets])
+    pair_a = np.concatenate(pair_a)
+    pair_b = np.concatenate(pair_b)
+    near = ((dst[pair_b] - projected[pair_a]) ** 2).sum(axis=1) <= radius * radius
+    pair_a = pair_a[near]
+    pair_b = pair_b[near]
+    if stats is not None:
+        stats["comparisons"] = len(pair_a)
+    if len(pair_a) == 0:
+        return MatchArray.empty()
+
+    distance = np.empty(len(pair_a), dtype=np.float32)
+    chunk = max(1, _MAX_GATHER_ELEMENTS // desc_a.shape[1])
+    for start in range(0, len(pair_a), chunk):
+        block = slice(start, start + chunk)
+        if metric == "hamming":
+            xor = np.bitwise_xor(desc_a[pair_a[block]], desc_b[pair_b[block]])
+            distance[block] = _POPCOUNT_8[xor].sum(axis=1)
+        else:
+            diff = desc_a[pair_a[block]].astype(np.float32) - desc_b[pair_b[block]]
+            distance[block] = np.sqrt(np.einsum("ij,ij->i", diff, diff))
+
+    # Nearest and second-nearest candidate of every query.
+    order = np.lexsort((distance, pair_a))
+    pair_a, pair_b, distance = pair_a[order], pair_b[order], distance[order]
+    first = np.flatnonzero(np.r_[True, pair_a[1:] != pair_a[:-1]])
+    second = np.full(len(first), np.inf, dtype=np.float32)
+    has_second = np.r_[first[1:], len(pair_a)] - first > 1
+    second[has_second] = distance[first[has_second] + 1]
+    keep = first[distance[first] < ratio * second]
+    return MatchArray(pair_a[keep], pair_b[keep], distance[keep])
 
 
 def draw_matches(
     img_a: np.ndarray,
     img_b: np.ndarray,
-    keypoints_a: Iterable[Tuple[float, float]],
-    keypoints_b: Iterable[Tuple[float, float]],
-    matches: List[Match] | List[cv2.DMatch],
+    keypoints_a: KeypointArray | Sequence[cv2.KeyPoint],
+    keypoints_b: KeypointArray | Sequence[cv2.KeyPoint],
+    matches: MatchArray | List[cv2.DMatch],
     inlier_indices: List[int],
 ) -> np.ndarray:
-    kp_a = [cv2.KeyPoint(float(x), float(y), 1) for x, y in keypoints_a]
-    kp_b = [cv2.KeyPoint(float(x), float(y), 1) for x, y in keypoints_b]
-    if matches and isinstance(matches[0], Match):
-        cv_matches = [
-            cv2.DMatch(_queryIdx=m.idx_a, _trainIdx=m.idx_b, _distance=m.distance)
-            for m in matches
-        ]
+    kp_a = keypoints_a.to_cv_keypoints() if isinstance(keypoints_a, KeypointArray) else keypoints_a
+    kp_b = keypoints_b.to_cv_keypoints() if isinstance(keypoints_b, KeypointArray) else keypoints_b
+    if isinstance(matches, MatchArray):
+        inlier_matches = matches[np.asarray(inlier_indices, dtype=np.intp)].to_cv_matches()
     else:
-        cv_matches = matches  # already cv2.DMatch
-    inlier_matches = [cv_matches[idx] for idx in inlier_indices]
+        inlier_matches = [matches[idx] for idx in inlier_indices]
     vis = cv2.drawMatches(
         img_a,
         kp_a,
@@ -510,8 +2816,91 @@ def draw_matches(
 # Script entry point
 
 
-def keypoints_to_array(kps: Sequence[Keypoint]) -> np.ndarray:
-    return np.array([[kp.x, kp.y] for kp in kps], dtype=np.float32)
+def keypoints_to_array(
+    kps: KeypointArray | Sequence[cv2.KeyPoint] | np.ndarray,
+) -> np.ndarray:
+    if isinstance(kps, KeypointArray):
+        return kps.points()
+    if isinstance(kps, np.ndarray):
+        return kps.astype(np.float32, copy=False)
+    return np.array([kp.pt for kp in kps], dtype=np.float32).reshape(-1, 2)
+
+
+def detect_opencv(
+    detector: cv2.Feature2D, image_gray: np.ndarray
+) -> Tuple[KeypointArray, np.ndarray]:
+    keypoints, descriptors = detector.detectAndCompute((image_gray * 255).astype(np.uint8), None)
+    if descriptors is None:
+        descriptors = np.zeros((0, detector.descriptorSize()), dtype=np.float32)
+    return KeypointArray.from_cv_keypoints(keypoints), descriptors
+
+
+def detect_features(
+    image_gray: np.ndarray,
+    params: Dict[str, object],
+    compute: Callable[[], Tuple[KeypointArray, np.ndarray]],
+    cache: FeatureCache | None,
+) -> Tuple[KeypointArray, np.ndarray]:
+    if cache is None:
+        return compute()
+    return cache.get_or_compute(image_gray, params, compute)
+
+
+def compare_descriptors(
+    args: argparse.Namespace,
+    detector_settings: Dict[str, object],
+    gray_a: np.ndarray,
+    gray_b: np.ndarray,
+    cache: FeatureCache | None,
+) -> Dict[str, Dict[str, object]]:
+    """Float SIFT and binary descriptors from the same detector, side by side.
+
+    Each type is detected, matched exhaustively (L2 or Hamming) and
+    registered with the run's RANSAC settings.  The ANN, quantized, GMS and
+    guided options are left out, so the rows differ only in the descriptor.
+    """
+    results: Dict[str, Dict[str, object]] = {}
+    for descriptor, match in (("sift", match_descriptors), ("binary", match_descriptors_hamming)):
+        sift = SIFTFromScratch(descriptor=descriptor, **detector_settings)
+        params = dict(sift.cache_params(), resize_width=args.resize_width)
+        start = time.perf_counter()
+        kp_a, desc_a = detect_features(
+            gray_a, params, lambda: sift.detect_and_compute(gray_a), cache
+        )
+        kp_b, desc_b = detect_features(
+            gray_b, params, lambda: sift.detect_and_compute(gray_b), cache
+        )
+        detect_time = time.perf_counter() - start
+        start = time.perf_counter()
+        matches = match(
+            desc_a,
+            desc_b,
+            args.ratio_test,
+            cross_check=args.cross_check,
+            tile_bytes=int(args.match_tile_mb * (1 << 20)),
+        )
+        match_time = time.perf_counter() - start
+        stats: Dict[str, float] = {}
+        _, inliers = ransac_transform(
+            kp_a,
+            kp_b,
+            matches,
+            args.ransac_iters,
+            args.ransac_threshold,
+            model=args.motion_model,
+            seed=args.ransac_seed,
+            confidence=args.ransac_confidence,
+            sampler=args.ransac_sampler,
+            stats=stats,
+        )
+        results[descriptor] = {
+            "descriptor_bytes": desc_a.itemsize * desc_a.shape[1],
+            "detect_s": round(detect_time, 4),
+            "match_s": round(match_time, 4),
+            "matches": len(matches),
+            "inliers": len(inliers),
+        }
+    return results
 
 
 def run_task(args: argparse.Namespace) -> None:
@@ -520,56 +2909,250 @@ def run_task(args: argparse.Namespace) -> None:
     gray_a = to_grayscale_float(img_a)
     gray_b = to_grayscale_float(img_b)
 
+    detector_settings: Dict[str, object] = {
+        "num_octaves": args.octaves,
+        "num_scales": args.scales,
+        "sigma": args.sigma,
+        "contrast_threshold": args.contrast_threshold,
+        "edge_threshold": args.edge_threshold,
+        "workers": args.workers,
+        "tile_size": args.tile_size,
+        "subpixel": args.subpixel,
+        "max_keypoints": args.max_keypoints,
+    }
     siftr = SIFTFromScratch(
-        num_octaves=args.octaves,
-        num_scales=args.scales,
-        sigma=args.sigma,
-        contrast_threshold=args.contrast_threshold,
-        edge_threshold=args.edge_threshold,
+        observer=StageRecorder() if args.instrument else None,
+        descriptor=args.descriptor,
+        **detector_settings,
     )
 
-    print("[Task2] Running custom SIFT pipeline ...")
-    custom_kp_a, custom_desc_a = siftr.detect_and_compute(gray_a)
-    custom_kp_b, custom_desc_b = siftr.detect_and_compute(gray_b)
+    cache = None
+    if args.feature_cache is not None:
+        cache = FeatureCache(args.feature_cache, int(args.feature_cache_mb * (1 << 20)))
+    custom_params = dict(siftr.cache_params(), resize_width=args.resize_width)
+
+    print(f"[Task2] Running custom SIFT pipeline ({args.descriptor} descriptors) ...")
+    if args.instrument:
+        tracemalloc.start()
+    start = time.perf_counter()
+    custom_kp_a, custom_desc_a = detect_features(
+        gray_a, custom_params, lambda: siftr.detect_and_compute(gray_a), cache
+    )
+    custom_kp_b, custom_desc_b = detect_features(
+        gray_b, custom_params, lambda: siftr.detect_and_compute(gray_b), cache
+    )
+    custom_detect_time = time.perf_counter() - start
+    if args.instrument:
+        tracemalloc.stop()
+        for name, entry in siftr.observer.stages.items():
+            print(
+                f"[Task2]   {name:<16} {entry['wall_s']:.3f}s wall, {entry['cpu_s']:.3f}s cpu, "
+                f"peak {entry['peak_bytes'] / (1 << 20):.1f} MiB"
+            )
     print(
         f"[Task2] Custom keypoints: image A={len(custom_kp_a)}, image B={len(custom_kp_b)}"
     )
 
-    custom_matches = match_descriptors(custom_desc_a, custom_desc_b, args.ratio_test)
+    match = match_descriptors_hamming if args.descriptor == "binary" else match_descriptors
+    start = time.perf_counter()
+    exact_matches = match(
+        custom_desc_a,
+        custom_desc_b,
+        args.ratio_test,
+        cross_check=args.cross_check,
+        tile_bytes=int(args.match_tile_mb * (1 << 20)),
+    )
+    exact_time = time.perf_counter() - start
+    custom_match_time = exact_time
+    custom_matches = exact_matches
+    ann_recall = None
+    if args.matcher == "ann":
+        start = time.perf_counter()
+        index = KDForestIndex(custom_desc_b, num_trees=args.ann_trees)
+        custom_matches = match_descriptors_ann(
+            custom_desc_a, index, args.ratio_test, checks=args.ann_checks
+        )
+        ann_time = time.perf_counter() - start
+        custom_match_time = ann_time
+        ann_recall = match_recall(custom_matches, exact_matches)
+        print(
+            f"[Task2] ANN matching: {ann_time:.3f}s (exact {exact_time:.3f}s), "
+            f"recall vs exact={ann_recall:.3f}"
+        )
+    quantized_agreement = None
+    descriptor_mib_per_10k = custom_desc_a.itemsize * custom_desc_a.shape[1] * 1e4 / (1 << 20)
+    if args.quantize:
+        start = time.perf_counter()
+        quant_desc_a = quantize_descriptors(custom_desc_a)
+        quant_desc_b = quantize_descriptors(custom_desc_b)
+        custom_matches = match_descriptors_quantized(
+            quant_desc_a,
+            quant_desc_b,
+            args.ratio_test,
+            cross_check=args.cross_check,
+            tile_bytes=int(args.match_tile_mb * (1 << 20)),
+        )
+        custom_match_time = time.perf_counter() - start
+        quantized_agreement = match_recall(custom_matches, exact_matches)
+        float_mib = descriptor_mib_per_10k
+        descriptor_mib_per_10k = quant_desc_a.shape[1] * 1e4 / (1 << 20)
+        print(
+            f"[Task2] Quantized matching: {custom_match_time:.3f}s (float {exact_time:.3f}s), "
+            f"{descriptor_mib_per_10k:.2f} MiB per 10k descriptors (float {float_mib:.2f}), "
+            f"agreement with float={quantized_agreement:.3f}"
+        )
+    gms_kept = None
+    if args.gms:
+        start = time.perf_counter()
+        gms_mask = gms_filter(
+            custom_kp_a,
+            custom_kp_b,
+            custom_matches,
+            gray_a.shape,
+            gray_b.shape,
+            grid=args.gms_grid,
+            alpha=args.gms_alpha,
+        )
+        gms_time = time.perf_counter() - start
+        custom_match_time += gms_time
+        gms_kept = int(gms_mask.sum())
+        print(
+            f"[Task2] GMS pre-filter: kept {gms_kept} of {len(custom_matches)} matches "
+            f"in {gms_time:.3f}s"
+        )
+        custom_matches = custom_matches[gms_mask]
     print(f"[Task2] Custom matches before RANSAC: {len(custom_matches)}")
-    custom_pts_a = keypoints_to_array(custom_kp_a)
-    custom_pts_b = keypoints_to_array(custom_kp_b)
-    custom_H, custom_inliers = ransac_homography(
-        custom_pts_a, custom_pts_b, custom_matches, args.ransac_iters, args.ransac_threshold
+    custom_ransac_stats: Dict[str, float] = {}
+    custom_H, custom_inliers = ransac_transform(
+        custom_kp_a,
+        custom_kp_b,
+        custom_matches,
+        args.ransac_iters,
+        args.ransac_threshold,
+        model=args.motion_model,
+        seed=args.ransac_seed,
+        confidence=args.ransac_confidence,
+        sampler=args.ransac_sampler,
+        stats=custom_ransac_stats,
+    )
+    print(
+        f"[Task2] Custom RANSAC inliers: {len(custom_inliers)} "
+        f"({custom_ransac_stats['iterations']} iterations, {custom_ransac_stats['model']})"
     )
-    print(f"[Task2] Custom RANSAC inliers: {len(custom_inliers)}")
+    first_pass_inliers = len(custom_inliers)
+    guided_matches = None
+    if args.guided_matching and custom_H is not None:
+        guided_stats: Dict[str, float] = {}
+        guided_ransac_stats: Dict[str, float] = {}
+        start = time.perf_counter()
+        guided_matches = match_descriptors_guided(
+            custom_kp_a,
+            custom_desc_a,
+            custom_kp_b,
+            custom_desc_b,
+            custom_H,
+            args.guided_radius,
+            args.guided_ratio,
+            metric="hamming" if args.descriptor == "binary" else "l2",
+            stats=guided_stats,
+        )
+        # Re-estimate with the model the first pass settled on.
+        guided_H, guided_inliers = ransac_transform(
+            custom_kp_a,
+            custom_kp_b,
+            guided_matches,
+            args.ransac_iters,
+            args.ransac_threshold,
+            model=custom_ransac_stats["model"],
+            seed=args.ransac_seed,
+            confidence=args.ransac_confidence,
+            sampler=args.ransac_sampler,
+            stats=guided_ransac_stats,
+        )
+        guided_time = time.perf_counter() - start
+        custom_match_time += guided_time
+        print(
+            f"[Task2] Guided matching: {len(guided_matches)} matches from "
+            f"{guided_stats['comparisons']} comparisons "
+            f"({guided_stats['comparisons'] / max(len(custom_kp_a), 1):.1f} per keypoint, "
+            f"{len(custom_kp_b)} for full matching) in {guided_time:.3f}s"
+        )
+        print(
+            f"[Task2] Custom RANSAC inliers after guided matching: {len(guided_inliers)} "
+            f"(was {first_pass_inliers})"
+        )
+        if guided_H is not None:
+            custom_matches, custom_H, custom_inliers = guided_matches, guided_H, guided_inliers
+            custom_ransac_stats = guided_ransac_stats
+    print(
+        f"[Task2] Custom timings: detection {custom_detect_time:.3f}s, "
+        f"matching {custom_match_time:.3f}s"
+    )
+    descriptor_comparison = None
+    if args.compare_descriptors:
+        descriptor_comparison = compare_descriptors(args, detector_settings, gray_a, gray_b, cache)
+        print("[Task2] Descriptor comparison (exhaustive matching, same detector and RANSAC):")
+        for name, row in descriptor_comparison.items():
+            print(
+                f"[Task2]   {name:<6} detection {row['detect_s']:.3f}s, "
+                f"matching {row['match_s']:.3f}s, {row['matches']} matches, "
+                f"{row['inliers']} inliers, {row['descriptor_bytes']} bytes per descriptor"
+            )
 
     print("[Task2] Running OpenCV SIFT baseline ...")
     reference = cv2.SIFT_create()
-    ref_kp_a, ref_desc_a = reference.detectAndCompute((gray_a * 255).astype(np.uint8), None)
-    ref_kp_b, ref_desc_b = reference.detectAndCompute((gray_b * 255).astype(np.uint8), None)
-    bf = cv2.BFMatcher(cv2.NORM_L2, crossCheck=False)
-    ref_matches_knn = bf.knnMatch(ref_desc_a, ref_desc_b, k=2)
-    ref_matches = []
-    for m, n in ref_matches_knn:
-        if m.distance < args.ratio_test * n.distance:
-            ref_matches.append(m)
-    ref_pts_a = np.array([kp.pt for kp in ref_kp_a], dtype=np.float32)
-    ref_pts_b = np.array([kp.pt for kp in ref_kp_b], dtype=np.float32)
-    ref_H, ref_inliers = ransac_homography(
-        ref_pts_a, ref_pts_b, ref_matches, args.ransac_iters, args.ransac_threshold
+    ref_params = {
+        "detector": "opencv",
+        "opencv_version": cv2.__version__,
+        "resize_width": args.resize_width,
+    }
+    start = time.perf_counter()
+    ref_kp_a, ref_desc_a = detect_features(
+        gray_a, ref_params, lambda: detect_opencv(reference, gray_a), cache
+    )
+    ref_kp_b, ref_desc_b = detect_features(
+        gray_b, ref_params, lambda: detect_opencv(reference, gray_b), cache
+    )
+    ref_detect_time = time.perf_counter() - start
+    start = time.perf_counter()
+    ref_matches = match_descriptors_opencv(ref_desc_a, ref_desc_b, args.ratio_test)
+    ref_match_time = time.perf_counter() - start
+    ref_pts_a = keypoints_to_array(ref_kp_a)
+    ref_pts_b = keypoints_to_array(ref_kp_b)
+    ref_ransac_stats: Dict[str, float] = {}
+    ref_H, ref_inliers = ransac_transform(
+        ref_pts_a,
+        ref_pts_b,
+        ref_matches,
+        args.ransac_iters,
+        args.ransac_threshold,
+        model=args.motion_model,
+        seed=args.ransac_seed,
+        confidence=args.ransac_confidence,
+        sampler=args.ransac_sampler,
+        stats=ref_ransac_stats,
     )
     print(f"[Task2] OpenCV keypoints: image A={len(ref_kp_a)}, image B={len(ref_kp_b)}")
     print(f"[Task2] OpenCV matches before RANSAC: {len(ref_matches)}")
-    print(f"[Task2] OpenCV RANSAC inliers: {len(ref_inliers)}")
+    print(
+        f"[Task2] OpenCV RANSAC inliers: {len(ref_inliers)} "
+        f"({ref_ransac_stats['iterations']} iterations, {ref_ransac_stats['model']})"
+    )
+    print(
+        f"[Task2] OpenCV timings: detection {ref_detect_time:.3f}s, "
+        f"matching {ref_match_time:.3f}s"
+    )
+
+    if cache is not None:
+        print(f"[Task2] Feature cache: {cache.hits} hits, {cache.misses} misses")
 
     args.output_dir.mkdir(parents=True, exist_ok=True)
     if custom_inliers:
         vis_custom = draw_matches(
             img_a,
             img_b,
-            [(kp.x, kp.y) for kp in custom_kp_a],
-            [(kp.x, kp.y) for kp in custom_kp_b],
+            custom_kp_a,
+            custom_kp_b,
             custom_matches,
             custom_inliers[:80],
         )
@@ -578,8 +3161,8 @@ def run_task(args: argparse.Namespace) -> None:
         vis_ref = draw_matches(
             img_a,
             img_b,
-            [kp.pt for kp in ref_kp_a],
-            [kp.pt for kp in ref_kp_b],
+            ref_kp_a,
+            ref_kp_b,
             ref_matches,
             ref_inliers[:80],
         )
@@ -588,14 +3171,37 @@ def run_task(args: argparse.Namespace) -> None:
     summary = {
         "custom_keypoints_A": len(custom_kp_a),
         "custom_keypoints_B": len(custom_kp_b),
+        "custom_descriptor": args.descriptor,
+        "custom_matcher": args.matcher,
+        "custom_gms_kept": gms_kept,
         "custom_matches": len(custom_matches),
+        "custom_ann_recall": ann_recall,
+        "custom_quantized_agreement": quantized_agreement,
+        "custom_descriptor_mib_per_10k": round(descriptor_mib_per_10k, 3),
         "custom_inliers": len(custom_inliers),
+        "custom_first_pass_inliers": first_pass_inliers,
+        "custom_guided_matches": len(guided_matches) if guided_matches is not None else None,
+        "custom_ransac_iterations": custom_ransac_stats["iterations"],
+        "custom_motion_model": custom_ransac_stats["model"],
+        "custom_detect_s": round(custom_detect_time, 4),
+        "custom_match_s": round(custom_match_time, 4),
         "opencv_keypoints_A": len(ref_kp_a),
         "opencv_keypoints_B": len(ref_kp_b),
         "opencv_matches": len(ref_matches),
         "opencv_inliers": len(ref_inliers),
+        "opencv_ransac_iterations": ref_ransac_stats["iterations"],
+        "opencv_motion_model": ref_ransac_stats["model"],
+        "opencv_detect_s": round(ref_detect_time, 4),
+        "opencv_match_s": round(ref_match_time, 4),
         "custom_homography": custom_H.tolist() if custom_H is not None else None,
         "opencv_homography": ref_H.tolist() if ref_H is not None else None,
+        "feature_cache_hits": cache.hits if cache is not None else None,
+        "custom_stage_stats": (
+            json.dumps(siftr.observer.as_dict()) if siftr.observer is not None else None
+        ),
+        "custom_descriptor_comparison": (
+            json.dumps(descriptor_comparison) if descriptor_comparison is not None else None
+        ),
     }
     summary_path = args.output_dir / "summary.txt"
     with summary_path.open("w", encoding="utf-8") as f:
@@ -0,0 +1,305 @@
+"""
+Tests for the Task 2 custom SIFT pipeline.
+
+Run from this directory with ``python -m pytest -q``.  Images are synthetic
+(see ``task2_benchmark.synthetic_texture``), so no data files are needed.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import math
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import task2_sift
+from task2_benchmark import synthetic_texture
+from task2_sift import (
+    FeatureCache,
+    KeypointArray,
+    MatchArray,
+    SIFTFromScratch,
+    gms_filter,
+    match_descriptors_guided,
+    match_descriptors_hamming,
+    parse_args,
+    ransac_transform,
+)
+
+COLUMNS = ("x", "y", "sigma", "orientation", "response", "octave", "layer")
+
+
+@pytest.fixture(scope="module")
+def texture() -> np.ndarray:
+    return synthetic_texture(701, 523, seed=3)
+
+
+def assert_same_features(
+    a: KeypointArray, desc_a: np.ndarray, b: KeypointArray, desc_b: np.ndarray
+) -> None:
+    assert len(a) == len(b)
+    for column in COLUMNS:
+        np.testing.assert_array_equal(getattr(a, column), getattr(b, column))
+    np.testing.assert_array_equal(desc_a, desc_b)
+
+
+# ---------------------------------------------------------------------------
+# Gradients
+
+
+def test_gradient_angles_match_per_sample_atan2(texture: np.ndarray) -> None:
+    # Bins are rounded from these angles, so they must not lose precision.
+    image = texture[:40, :50].astype(np.float32)
+    _, orientation = SIFTFromScratch._gradient_level(image)
+    expected = np.zeros(image.shape)
+    for y in range(1, image.shape[0] - 1):
+        for x in range(1, image.shape[1] - 1):
+            gx = image[y, x + 1] - image[y, x - 1]
+            gy = image[y - 1, x] - image[y + 1, x]
+            expected[y, x] = math.degrees(math.atan2(gy, gx)) % 360
+    np.testing.assert_allclose(orientation[1:-1, 1:-1], expected[1:-1, 1:-1], rtol=0, atol=1e-9)
+
+
+# ---------------------------------------------------------------------------
+# Parallel levels
+
+
+def traced_peak(sift: SIFTFromScratch, image: np.ndarray) -> int:
+    tracemalloc.start()
+    try:
+        sift.detect_and_compute(image)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_workers_keep_few_tiles_alive() -> None:
+    # 48 tiles in the first octave; binary descriptors keep per-job scratch small,
+    # so the peak is dominated by the tile pyramids that are alive at once.
+    image = synthetic_texture(960, 720, seed=3)
+    settings = {"tile_size": 128, "descriptor": "binary"}
+    serial = traced_peak(SIFTFromScratch(**settings), image)
+    parallel = traced_peak(SIFTFromScratch(workers=4, **settings), image)
+    assert parallel < 4 * serial
+
+
+@pytest.mark.parametrize(
+    "settings", [{}, {"subpixel": True}, {"descriptor": "binary"}, {"quantize": True}]
+)
+@pytest.mark.parametrize("tile_size", [64, 200])
+def test_tiling_does_not_change_output(
+    texture: np.ndarray, settings: dict, tile_size: int
+) -> None:
+    # 64 px tiles all four octaves of the texture, 200 px the first two.
+    untiled = SIFTFromScratch(**settings).detect_and_compute(texture)
+    tiled = SIFTFromScratch(tile_size=tile_size, **settings).detect_and_compute(texture)
+    assert_same_features(*untiled, *tiled)
+
+
+def test_workers_do_not_change_output(texture: np.ndarray) -> None:
+    serial = SIFTFromScratch(tile_size=200).detect_and_compute(texture)
+    parallel = SIFTFromScratch(tile_size=200, workers=3).detect_and_compute(texture)
+    assert_same_features(*serial, *parallel)
+
+
+# ---------------------------------------------------------------------------
+# Keypoint budget
+
+
+@pytest.mark.parametrize(
+    "settings",
+    [{}, {"tile_size": 200, "workers": 3}, {"descriptor": "binary"}, {"subpixel": True}],
+)
+@pytest.mark.parametrize("budget", [1, 300])
+def test_budget_is_grid_bucketing_of_full_output(
+    texture: np.ndarray, settings: dict, budget: int
+) -> None:
+    full, full_desc = SIFTFromScratch(**settings).detect_and_compute(texture)
+    assert len(full) > budget
+    keypoints, descriptors = SIFTFromScratch(
+        max_keypoints=budget, **settings
+    ).detect_and_compute(texture)
+
+    assert len(keypoints) == budget
+    chosen = SIFTFromScratch._grid_bucket(full, texture.shape, budget)
+    assert_same_features(keypoints, descriptors, full[chosen], full_desc[chosen])
+
+
+def test_budget_above_keypoint_count_keeps_everything(texture: np.ndarray) -> None:
+    full, full_desc = SIFTFromScratch().detect_and_compute(texture)
+    keypoints, descriptors = SIFTFromScratch(max_keypoints=len(full) + 1).detect_and_compute(
+        texture
+    )
+    assert_same_features(keypoints, descriptors, full, full_desc)
+
+
+def test_budget_holds_only_a_few_patches() -> None:
+    # Dense texture: thousands of keypoints compete for a small budget.
+    image = synthetic_texture(1280, 960, seed=3)
+    unlimited = traced_peak(SIFTFromScratch(tile_size=256), image)
+    budgeted = traced_peak(SIFTFromScratch(tile_size=256, max_keypoints=200), image)
+    assert budgeted < unlimited / 2
+
+
+@pytest.mark.parametrize("budget", [0, -5])
+def test_budget_below_one_is_rejected(budget: int) -> None:
+    with pytest.raises(ValueError):
+        SIFTFromScratch(max_keypoints=budget)
+
+
+# ---------------------------------------------------------------------------
+# Matching
+
+
+@pytest.mark.parametrize("cross_check", [False, True])
+def test_hamming_matches_brute_force(cross_check: bool) -> None:
+    rng = np.random.default_rng(1)
+    desc_a = rng.integers(0, 256, (300, 32), dtype=np.uint8)
+    desc_b = rng.integers(0, 256, (257, 32), dtype=np.uint8)
+    desc_b[:100] = desc_a[:100] ^ rng.integers(0, 2, (100, 32), dtype=np.uint8)
+    distance = np.unpackbits(desc_a[:, None] ^ desc_b[None], axis=2).sum(axis=2)
+    nearest = np.sort(distance, axis=1)
+    expected = np.flatnonzero(nearest[:, 0] < 0.8 * nearest[:, 1])
+    if cross_check:
+        best_b = distance.argmin(axis=1)[expected]
+        mutual = distance[expected, best_b] <= distance.min(axis=0)[best_b]
+        expected = expected[mutual]
+
+    # A tiny tile budget exercises the merging across row and column tiles.
+    for tile_bytes in (1 << 26, 4096):
+        matches = match_descriptors_hamming(
+            desc_a, desc_b, 0.8, cross_check=cross_check, tile_bytes=tile_bytes
+        )
+        np.testing.assert_array_equal(matches.idx_a, expected)
+        np.testing.assert_array_equal(matches.idx_b, distance.argmin(axis=1)[expected])
+        np.testing.assert_array_equal(matches.distance, nearest[expected, 0])
+
+
+# ---------------------------------------------------------------------------
+# RANSAC
+
+
+@pytest.mark.parametrize("count", [1, 2, 3])
+def test_auto_model_fits_too_few_matches_for_a_homography(count: int) -> None:
+    pts_a = np.array([[10.0, 10.0], [50.0, 20.0], [30.0, 80.0]])[:count]
+    ids = np.arange(count)
+    stats: dict = {}
+    transform, inliers = ransac_transform(
+        pts_a,
+        pts_a + [5, 7],
+        MatchArray(ids, ids, np.zeros(count, dtype=np.float32)),
+        1000,
+        2.0,
+        model="auto",
+        stats=stats,
+    )
+    assert inliers == ids.tolist()
+    assert stats["model"] == "translation"
+    np.testing.assert_allclose(transform[:2, 2], [5, 7])
+
+
+def guided_brute_force(
+    pts_a: np.ndarray, desc_a: np.ndarray, pts_b: np.ndarray, desc_b: np.ndarray, radius: float
+) -> list:
+    matches = []
+    for a, (point, desc) in enumerate(zip(pts_a, desc_a)):
+        near = np.flatnonzero(np.linalg.norm(pts_b - point, axis=1) <= radius)
+        distance = np.linalg.norm(desc_b[near] - desc, axis=1)
+        order = np.argsort(distance, kind="stable")
+        if len(near) == 1 or (len(near) > 1 and distance[order[0]] < 0.8 * distance[order[1]]):
+            matches.append((a, near[order[0]]))
+    return matches
+
+
+@pytest.mark.parametrize("radius", [1e-3, 3.0, 40.0])
+def test_guided_matches_brute_force(radius: float) -> None:
+    # At 1e-3 px a dense cell grid over the 640 px box would need ~3 TB.
+    rng = np.random.default_rng(2)
+    pts_a = rng.uniform(0, 640, (400, 2))
+    pts_b = np.vstack([pts_a[:200] + rng.normal(0, 1e-4, (200, 2)), rng.uniform(0, 640, (300, 2))])
+    desc_a = rng.normal(size=(400, 16)).astype(np.float32)
+    desc_b = rng.normal(size=(500, 16)).astype(np.float32)
+    matches = match_descriptors_guided(pts_a, desc_a, pts_b, desc_b, np.eye(3), radius, 0.8)
+    assert list(zip(matches.idx_a, matches.idx_b)) == guided_brute_force(
+        pts_a, desc_a, pts_b, desc_b, radius
+    )
+
+
+@pytest.mark.parametrize("radius", [0.0, -1.0])
+def test_guided_radius_must_be_positive(radius: float) -> None:
+    points = np.zeros((1, 2))
+    desc = np.zeros((1, 16), dtype=np.float32)
+    with pytest.raises(ValueError):
+        match_descriptors_guided(points, desc, points, desc, np.eye(3), radius, 0.8)
+    with pytest.raises(SystemExit):
+        parse_args(["--image-a", "a.png", "--image-b", "b.png", "--guided-radius", str(radius)])
+
+
+# ---------------------------------------------------------------------------
+# GMS
+
+
+def shifted_matches(count: int, seed: int = 0) -> tuple:
+    """Points of a 640x480 image moved by (25, 10); the second half are outliers."""
+    rng = np.random.default_rng(seed)
+    pts_a = rng.uniform(0, 1, (count, 2)) * [640, 480]
+    pts_b = pts_a + [25, 10]
+    pts_b[count // 2 :] = rng.uniform(0, 1, (count - count // 2, 2)) * [640, 480]
+    ids = np.arange(count)
+    return pts_a, pts_b, MatchArray(ids, ids, np.zeros(count, dtype=np.float32))
+
+
+def test_gms_keeps_consistent_motion() -> None:
+    pts_a, pts_b, matches = shifted_matches(10000)
+    keep = gms_filter(pts_a, pts_b, matches, (480, 640), (480, 640), grid=10)
+    assert keep[:5000].mean() > 0.9
+    assert keep[5000:].mean() < 0.05
+
+
+def test_gms_fine_grid_memory_follows_matches() -> None:
+    # A dense (grid + 1) ** 4 histogram would need about 200 GB here.
+    pts_a, pts_b, matches = shifted_matches(20000)
+    tracemalloc.start()
+    try:
+        keep = gms_filter(pts_a, pts_b, matches, (480, 640), (480, 640), grid=400, alpha=1.0)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert keep.shape == (20000,)
+    assert peak < 32 << 20
+
+
+# ---------------------------------------------------------------------------
+# Feature cache
+
+
+def churn_cache(root: Path, seed: int) -> int:
+    """Fill a tiny shared cache with random entries so evictions run constantly."""
+    cache = FeatureCache(root, max_bytes=200_000)
+    rng = np.random.default_rng(seed)
+    for _ in range(150):
+        image = rng.integers(0, 8, (4, 4)).astype(np.float32)
+        cache.get_or_compute(
+            image, {}, lambda: (KeypointArray.empty(), np.zeros((200, 128), np.float32))
+        )
+    return cache.hits + cache.misses
+
+
+def test_cache_survives_concurrent_eviction(tmp_path: Path) -> None:
+    # Batch workers share one directory: each one's evictions delete entries
+    # while the others are scanning or reading them.
+    with concurrent.futures.ProcessPoolExecutor(6) as pool:
+        lookups = list(pool.map(churn_cache, [tmp_path] * 6, range(6)))
+    assert lookups == [150] * 6
+
+
+def test_cache_key_changes_with_feature_version(
+    texture: np.ndarray, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    sift = SIFTFromScratch()
+    key = FeatureCache.key(texture, sift.cache_params())
+    monkeypatch.setattr(task2_sift, "_FEATURE_VERSION", task2_sift._FEATURE_VERSION + 1)
+    assert FeatureCache.key(texture, sift.cache_params()) != key